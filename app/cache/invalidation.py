@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.cache.local import LocalCache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "url:invalidate"
+
+
+class CacheInvalidator:
+    """Propagates short code changes to the L1 cache of every worker via Redis pub/sub.
+
+    Writers call ``publish`` after committing; every worker runs ``start`` once
+    and evicts the announced short codes from its local cache.
+    """
+
+    def __init__(self, redis_client: redis.Redis, cache: LocalCache, channel: str = INVALIDATION_CHANNEL):
+        self.redis = redis_client
+        self.cache = cache
+        self.channel = channel
+        self._listen_task: Optional[asyncio.Task] = None
+
+    async def publish(self, short_code: str) -> None:
+        """Drop the shared Redis mapping and tell every worker to evict the short code."""
+        self.cache.delete(short_code)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(f"url:{short_code}")
+            pipe.publish(self.channel, short_code)
+            await pipe.execute()
+
+    async def publish_many(self, short_codes: list[str]) -> None:
+        """Invalidate several short codes with a single pipelined round trip."""
+        if not short_codes:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for short_code in short_codes:
+                self.cache.delete(short_code)
+                pipe.delete(f"url:{short_code}")
+                pipe.publish(self.channel, short_code)
+            await pipe.execute()
+
+    async def start(self) -> None:
+        """Start listening for invalidations in the background."""
+        self._listen_task = asyncio.create_task(self._listen_loop())
+        logger.info(f"Listening for cache invalidations on {self.channel}")
+
+    async def stop(self) -> None:
+        if self._listen_task:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+
+    async def _listen_loop(self) -> None:
+        """Subscribe to the invalidation channel, resubscribing after connection errors."""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Anything published while we were not subscribed is lost, start clean
+                    self.cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.cache.delete(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in cache invalidation listener: {str(e)}")
+                await asyncio.sleep(1)
@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, UTC
+from typing import Any, Callable, Optional
+
+from app.cache.redis import CacheManagerProtocol, build_url_mapping
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Bounded in-process LRU store with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize: int, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = _MISSING) -> Any:
+        """Return the cached value, or ``default`` when absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires, value = entry
+        if expires <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for ``ttl`` seconds, evicting the least recently used entry when full."""
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class LocalCacheManager:
+    """L1 cache in front of another CacheManager (normally RedisCacheManager).
+
+    Hot short codes are served from process memory without a network hop.
+    Entries live for at most ``ttl`` seconds and never beyond the mapping's
+    ``expires_at``; negative lookups are kept for ``negative_ttl`` seconds.
+    """
+
+    def __init__(self, inner: CacheManagerProtocol, cache: LocalCache, ttl: int, negative_ttl: int):
+        self.inner = inner
+        self.cache = cache
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    async def set_url_mapping(self, short_code: str, original_url: str, expires_at: datetime):
+        await self.inner.set_url_mapping(short_code, original_url, expires_at)
+        data = build_url_mapping(original_url, expires_at)
+        self.cache.set(short_code, data, self._ttl_for(data))
+
+    async def set_missing_mapping(self, short_code: str):
+        await self.inner.set_missing_mapping(short_code)
+        self.cache.set(short_code, {"original_url": None}, self.negative_ttl)
+
+    async def get_url_mapping(self, short_code: str) -> Optional[dict]:
+        data = self.cache.get(short_code)
+        if data is not _MISSING:
+            return data
+
+        data = await self.inner.get_url_mapping(short_code)
+        if data is None:
+            return None
+        ttl = self._ttl_for(data)
+        if ttl <= 0:
+            # The upstream entry outlived the URL itself, let the caller go to the database
+            return None
+        self.cache.set(short_code, data, ttl)
+        return data
+
+    def _ttl_for(self, data: dict) -> float:
+        """L1 lifetime for a mapping: the configured TTL capped by the URL's expiry."""
+        if data.get("original_url") is None:
+            return self.negative_ttl
+        expires_at = data.get("expires_at")
+        if not expires_at:
+            return self.ttl
+        remaining = (datetime.fromisoformat(expires_at) - datetime.now(UTC)).total_seconds()
+        return min(self.ttl, remaining)
+
+    async def acquire_fill_lock(self, short_code: str, ttl_ms: int) -> Optional[str]:
+        return await self.inner.acquire_fill_lock(short_code, ttl_ms)
+
+    async def release_fill_lock(self, short_code: str, token: str):
+        await self.inner.release_fill_lock(short_code, token)
+
+    def evict(self, short_code: str) -> None:
+        """Drop a short code from the local cache."""
+        self.cache.delete(short_code)
+
+    async def increment_click_count(self, short_code: str):
+        await self.inner.increment_click_count(short_code)
+
+    async def get_click_stats(self, short_code: str, days: int = 7) -> dict:
+        return await self.inner.get_click_stats(short_code, days)
+
@@ -0,0 +1,26 @@
+import secrets
+from typing import Optional
+
+import redis.asyncio as redis
+
+# Delete the lock only if it still holds our token, so a holder whose lock
+# expired never removes the lock another worker has taken since
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_lock(redis_client: redis.Redis, key: str, ttl_ms: int) -> Optional[str]:
+    """SET NX PX a random token on ``key``; returns the token, or None if the lock is held."""
+    token = secrets.token_hex(16)
+    if await redis_client.set(key, token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+
+async def release_lock(redis_client: redis.Redis, key: str, token: str) -> bool:
+    """Compare-and-delete ``key``; False if the lock expired and is now someone else's."""
+    return bool(await redis_client.eval(RELEASE_SCRIPT, 1, key, token))
@@ -1,24 +1,60 @@
 import json
+import logging
 from datetime import datetime, timedelta, UTC
-from typing import Optional, Protocol, AsyncGenerator
+from typing import Optional, Protocol
 
 import redis.asyncio as redis
 from dotenv import load_dotenv
-from app.core.config import settings
+from redis._parsers import _AsyncRESP2Parser
+from redis.utils import HIREDIS_AVAILABLE
+from app.cache.locks import acquire_lock, release_lock
+from app.core.config import settings, Settings
+from app.core.stats_layouts import StatsLayout, create_stats_layout
 
 
 load_dotenv()
 
-async def get_redis() -> AsyncGenerator[redis.Redis, None]:
-    """Get Redis client."""
-    client = redis.Redis.from_url(
-        settings.REDIS_URL,
-        decode_responses=True,
-    )
-    try:
-        yield client
-    finally:
-        await client.aclose()
+logger = logging.getLogger(__name__)
+
+
+def create_redis_pool(settings: Settings) -> redis.BlockingConnectionPool:
+    """Create the worker-wide Redis connection pool (owned by lifespan)."""
+    options = {
+        "decode_responses": True,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+    }
+    # redis-py picks the hiredis parser automatically when the package is installed
+    if not settings.REDIS_USE_HIREDIS:
+        options["parser_class"] = _AsyncRESP2Parser
+    elif not HIREDIS_AVAILABLE:
+        logger.warning("REDIS_USE_HIREDIS is set but hiredis is not installed, using the Python parser")
+    return redis.BlockingConnectionPool.from_url(settings.REDIS_URL, **options)
+
+
+def redis_pool_stats(pool: redis.ConnectionPool) -> dict:
+    """Connection usage of a Redis pool."""
+    in_use = len(pool._in_use_connections)
+    idle = len([c for c in pool._available_connections if c is not None])
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": in_use,
+        "idle": idle,
+        "hiredis": HIREDIS_AVAILABLE and settings.REDIS_USE_HIREDIS,
+    }
+
+
+def build_url_mapping(original_url: str, expires_at: datetime) -> dict:
+    """Cached representation of a URL mapping; ``cached_at`` drives stale-while-revalidate."""
+    return {
+        "original_url": original_url,
+        "expires_at": expires_at.isoformat(),
+        "cached_at": datetime.now(UTC).timestamp(),
+    }
 
 
 class CacheManagerProtocol(Protocol):
@@ -26,8 +62,14 @@ class CacheManagerProtocol(Protocol):
 
     async def set_url_mapping(self, short_code: str, original_url: str, expires_at: datetime): ...
 
+    async def set_missing_mapping(self, short_code: str): ...
+
     async def get_url_mapping(self, short_code: str) -> Optional[dict]: ...
 
+    async def acquire_fill_lock(self, short_code: str, ttl_ms: int) -> Optional[str]: ...
+
+    async def release_fill_lock(self, short_code: str, token: str): ...
+
     async def increment_click_count(self, short_code: str): ...
 
     async def get_click_stats(self, short_code: str, days: int = 7) -> dict: ...
@@ -36,17 +78,25 @@ class CacheManagerProtocol(Protocol):
 class RedisCacheManager:
     """Manages URL and click statistics caching using Redis."""
 
-    def __init__(self, redis_client: redis.Redis):
+    def __init__(self, redis_client: redis.Redis, stats_layout: Optional[StatsLayout] = None):
         self.redis = redis_client
+        # Same key layout as the stats queue, so both read and write one scheme
+        self.stats_layout = stats_layout or create_stats_layout(settings)
         self.URL_TTL = settings.URL_TTL
         self.STATS_TTL = settings.STATS_TTL
+        self.NEGATIVE_TTL = settings.URL_NEGATIVE_TTL
 
     async def set_url_mapping(self, short_code: str, original_url: str, expires_at: datetime):
         """Stores the mapping of a short URL to its original URL in Redis."""
         key = f"url:{short_code}"
-        data = {"original_url": original_url, "expires_at": expires_at.isoformat()}
+        data = build_url_mapping(original_url, expires_at)
         await self.redis.setex(key, self.URL_TTL, json.dumps(data))
 
+    async def set_missing_mapping(self, short_code: str):
+        """Caches a negative lookup so unknown codes do not hit the database on every request."""
+        key = f"url:{short_code}"
+        await self.redis.setex(key, self.NEGATIVE_TTL, json.dumps({"original_url": None}))
+
     async def get_url_mapping(self, short_code: str) -> Optional[dict]:
         """Retrieves the original URL mapping from Redis using the short code."""
         key = f"url:{short_code}"
@@ -55,26 +105,37 @@ class RedisCacheManager:
             return json.loads(data)
         return None
 
+    async def acquire_fill_lock(self, short_code: str, ttl_ms: int) -> Optional[str]:
+        """Try to become the only worker filling the cache for a short code; returns the lock token."""
+        return await acquire_lock(self.redis, f"lock:url:{short_code}", ttl_ms)
+
+    async def release_fill_lock(self, short_code: str, token: str):
+        await release_lock(self.redis, f"lock:url:{short_code}", token)
+
     async def increment_click_count(self, short_code: str):
         """Increments the click count for a given short URL and current day."""
         today = datetime.now(UTC).strftime("%Y%m%d")
-        key = f"clicks:{short_code}:{today}"
-        await self.redis.incr(key)
-        await self.redis.expire(key, self.STATS_TTL)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self.stats_layout.record(pipe, short_code, today, 1, ())
+            await pipe.execute()
 
     async def get_click_stats(self, short_code: str, days: int = 7) -> dict:
         """Retrieves click statistics for a short URL over a specified number of days."""
-        stats_data = {}
-        for i in reversed(range(days)):
-            date = (datetime.now(UTC) - timedelta(days=i)).strftime("%Y%m%d")
-            key = f"clicks:{short_code}:{date}"
-            count = await self.redis.get(key)
-            stats_data[date] = int(count) if count else 0
-        return stats_data
+        today = datetime.now(UTC)
+        dates = [(today - timedelta(days=i)).strftime("%Y%m%d") for i in reversed(range(days))]
+        clicks, _ = await self.stats_layout.read(self.redis, short_code, dates)
+        return clicks
 
     async def get_tracked_short_codes(self) -> list[str]:
-        """Get all short codes currently being tracked."""
-        return await self.redis.keys("url:stats:*")
+        """Get all short codes currently being tracked.
+
+        Uses incremental SCAN rather than KEYS so Redis is never blocked.
+        """
+        codes = {
+            key.split(":")[2]
+            async for key in self.redis.scan_iter(match="url:stats:*", count=1000)
+        }
+        return list(codes)
 
 
 # Default cache instance, adhering to the protocol
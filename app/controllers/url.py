@@ -1,8 +1,16 @@
-from fastapi.responses import RedirectResponse
+import hashlib
+import json
+import secrets
+from datetime import datetime, UTC
+from typing import Iterator, Optional
+from fastapi import Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from app.services.shortener import ShortenService
-from app.schemas.url import URLCreate, URLResponse
-from app.core.exceptions.exceptions import URLNotFoundError, URLValidationError
+from app.schemas.url import StatsBatchRequest, URLBulkCreate, URLCreate, URLResponse
+from app.core.exceptions.exceptions import AdminAccessError, URLNotFoundError, URLValidationError
 from app.core.config import Settings
+from app.core.rollups import DEFAULT_SPAN, Granularity, bucket_range
+from app.core.trending import TrendingWindow
 
 class URLController:
     def __init__(self, shorten_service: ShortenService, settings: Settings):
@@ -21,28 +29,105 @@ class URLController:
         except ValueError as e:
             raise URLValidationError(str(e))
 
-    async def resolve_short_url(self, short_code: str) -> dict:
+    async def create_short_urls_bulk(self, url_data: URLBulkCreate) -> StreamingResponse:
+        """Create short URLs for many URLs and return the results as NDJSON.
+
+        All results are computed before the response starts, so this is NDJSON
+        framing, not incremental streaming.
+        """
+        try:
+            results = await self.service.create_short_urls_bulk(url_data.original_urls)
+        except ValueError as e:
+            raise URLValidationError(str(e))
+        return StreamingResponse(_ndjson_lines(results), media_type="application/x-ndjson")
+
+    async def resolve_short_url(self, short_code: str, request: Optional[Request] = None) -> dict:
         """Resolves a short code to its original URL and logs click event."""
-        original_url = await self.service.resolve_short_url(short_code)
+        original_url = await self.service.resolve_short_url(short_code, _visitor_id(request))
         if not original_url:
             raise URLNotFoundError("Short URL not found")
         return {"original_url": original_url}
 
-    async def redirect_to_url(self, short_code: str) -> RedirectResponse:
+    async def redirect_to_url(self, short_code: str, request: Optional[Request] = None) -> RedirectResponse:
         """Redirect to the original URL for the given short code."""
         try:
-            result = await self.service.resolve_short_url(short_code)
+            result = await self.service.resolve_short_url(short_code, _visitor_id(request))
             return RedirectResponse(url=result)
         except ValueError as e:
             raise URLNotFoundError(str(e))
 
-    async def get_url_stats(self, short_code: str) -> dict:
-        """Get statistics for a short URL."""
+    async def deactivate_short_url(self, short_code: str, admin_key: Optional[str]) -> dict:
+        """Deactivate a short URL; requires ADMIN_API_KEY."""
+        expected = self.settings.ADMIN_API_KEY
+        if not expected or not admin_key or not secrets.compare_digest(admin_key, expected):
+            raise AdminAccessError("Admin API key required")
+        if not await self.service.deactivate_short_url(short_code):
+            raise URLNotFoundError("Short URL not found")
+        return {"short_code": short_code, "is_active": False}
+
+    async def get_url_stats(
+        self,
+        short_code: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[Granularity] = None
+    ) -> dict:
+        """Get statistics for a short URL.
+
+        Without a range or granularity this is the 7-day daily summary; otherwise
+        clicks are returned per bucket of the requested range.
+        """
+        if start or end or granularity:
+            return await self.get_url_stats_range(short_code, start, end, granularity or "day")
         try:
             result = await self.service.get_url_stats(short_code)
             return {
                 "short_code": result["short_code"],
-                "clicks": result["clicks"]
+                "clicks": result["clicks"],
+                "unique_visitors": result.get("unique_visitors", {})
             }
         except ValueError as e:
-            raise URLNotFoundError(str(e)) 
\ No newline at end of file
+            raise URLNotFoundError(str(e))
+
+
+    async def get_top_urls(self, window: TrendingWindow, n: int) -> dict:
+        """Get the most clicked short URLs within a time window."""
+        return await self.service.get_top_urls(window, n)
+
+    async def get_url_stats_range(
+        self,
+        short_code: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        granularity: Granularity
+    ) -> dict:
+        """Get clicks of a short URL per minute, hour or day over a time range."""
+        end = end or datetime.now(UTC)
+        start = start or end - DEFAULT_SPAN[granularity]
+        try:
+            bucket_range(start, end, granularity)
+        except ValueError as e:
+            raise URLValidationError(str(e))
+        try:
+            return await self.service.get_url_stats_range(short_code, start, end, granularity)
+        except ValueError as e:
+            raise URLNotFoundError(str(e))
+
+    async def get_url_stats_batch(self, stats_request: StatsBatchRequest) -> dict:
+        """Get statistics for many short URLs over a date range."""
+        return await self.service.get_url_stats_batch(
+            stats_request.short_codes, stats_request.start_date, stats_request.end_date
+        )
+
+
+def _visitor_id(request: Optional[Request]) -> Optional[str]:
+    """Anonymous visitor fingerprint (client IP + User-Agent) for unique-visitor counts."""
+    if request is None or request.client is None:
+        return None
+    fingerprint = f"{request.client.host}|{request.headers.get('user-agent', '')}"
+    return hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+
+
+def _ndjson_lines(results: list[dict]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result) + "\n"
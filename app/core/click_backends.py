@@ -0,0 +1,199 @@
+import logging
+import os
+import socket
+from typing import Optional, Protocol
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+# A claimed click event: (entry id, raw payload)
+ClaimedEvent = tuple[str, str]
+
+DEAD_LETTER_MAXLEN = 100000
+
+
+async def dead_letter(redis: Redis, key: str, events: list[tuple[str, str]]) -> None:
+    """Append (payload, error) pairs to the dead-letter stream."""
+    if not events:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for payload, error in events:
+            pipe.xadd(key, {"e": payload, "error": error}, maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        await pipe.execute()
+
+
+class ClickBackend(Protocol):
+    """Protocol for the transport that buffers click events between redirects and the processor."""
+
+    async def initialize(self) -> None: ...
+
+    async def push(self, payload: str) -> int: ...
+
+    async def claim(self, count: int) -> list[ClaimedEvent]: ...
+
+    async def ack(self, entry_ids: list[str]) -> None: ...
+
+    async def release(self, events: list[ClaimedEvent]) -> None: ...
+
+    async def metrics(self) -> dict: ...
+
+
+class ListClickBackend:
+    """Redis list transport: LPUSH on redirect, RPOP <count> in the processor."""
+
+    def __init__(self, redis: Redis, key: str, max_length: int):
+        self.redis = redis
+        self.key = key
+        self.max_length = max_length
+
+    async def initialize(self) -> None:
+        return None
+
+    async def push(self, payload: str) -> int:
+        """Push one event and return how many old events were trimmed to respect the bound."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lpush(self.key, payload)
+            # Bound the backlog: the oldest events (tail of the list) are dropped
+            pipe.ltrim(self.key, 0, self.max_length - 1)
+            length, _ = await pipe.execute()
+        return max(length - self.max_length, 0)
+
+    async def claim(self, count: int) -> list[ClaimedEvent]:
+        # RPOP with a count claims the oldest events atomically, so concurrent
+        # drainers never see the same event and no LREM scan is needed
+        payloads = await self.redis.rpop(self.key, count)
+        return [(str(i), payload) for i, payload in enumerate(payloads or [])]
+
+    async def ack(self, entry_ids: list[str]) -> None:
+        # Popped events are already gone from the list
+        return None
+
+    async def release(self, events: list[ClaimedEvent]) -> None:
+        """Return claimed events to the consuming end so they are retried first."""
+        if events:
+            await self.redis.rpush(self.key, *[payload for _, payload in reversed(events)])
+
+    async def metrics(self) -> dict:
+        return {"backend": "list", "queue_length": await self.redis.llen(self.key)}
+
+
+class StreamClickBackend:
+    """Redis Streams transport drained through a consumer group.
+
+    Every worker joins the same group, so XREADGROUP splits the load between
+    them. Entries stay in the group's pending list until acknowledged; entries
+    left pending by a crashed consumer for longer than ``claim_idle_ms`` are
+    reclaimed by whichever worker drains next.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key: str,
+        max_length: int,
+        group: str,
+        claim_idle_ms: int,
+        max_deliveries: int,
+        dead_letter_key: str,
+        consumer: Optional[str] = None
+    ):
+        self.redis = redis
+        self.key = key
+        self.max_length = max_length
+        self.group = group
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.dead_letter_key = dead_letter_key
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+
+    async def initialize(self) -> None:
+        """Create the consumer group (and the stream) if they do not exist yet."""
+        try:
+            await self.redis.xgroup_create(self.key, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group {self.group} on {self.key}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def push(self, payload: str) -> int:
+        # Approximate MAXLEN trimming keeps XADD O(1) while bounding memory
+        await self.redis.xadd(self.key, {"e": payload}, maxlen=self.max_length, approximate=True)
+        return 0
+
+    async def claim(self, count: int) -> list[ClaimedEvent]:
+        events = await self._reclaim_stale(count)
+        if len(events) < count:
+            response = await self.redis.xreadgroup(
+                self.group, self.consumer, {self.key: ">"}, count=count - len(events)
+            )
+            for _, entries in response or []:
+                events.extend(self._payloads(entries))
+        return events
+
+    async def _reclaim_stale(self, count: int) -> list[ClaimedEvent]:
+        """Take over entries that another consumer read but never acknowledged."""
+        pending = await self.redis.xpending_range(
+            self.key, self.group, min="-", max="+", count=count, idle=self.claim_idle_ms
+        )
+        if not pending:
+            return []
+
+        exhausted_ids = {p["message_id"] for p in pending if p["times_delivered"] >= self.max_deliveries}
+        claimed = await self.redis.xclaim(
+            self.key, self.group, self.consumer, self.claim_idle_ms,
+            [p["message_id"] for p in pending]
+        )
+        # Entries trimmed by MAXLEN while pending come back without fields
+        trimmed = [entry_id for entry_id, fields in claimed if not fields]
+        if trimmed:
+            await self.ack(trimmed)
+
+        events, exhausted = [], []
+        for event in self._payloads(claimed):
+            (exhausted if event[0] in exhausted_ids else events).append(event)
+        if exhausted:
+            # Poison entries that keep failing are parked instead of retried forever
+            await dead_letter(
+                self.redis, self.dead_letter_key,
+                [(payload, f"exceeded {self.max_deliveries} deliveries") for _, payload in exhausted]
+            )
+            await self.ack([entry_id for entry_id, _ in exhausted])
+        logger.info(f"Reclaimed {len(claimed)} pending click events for {self.consumer}")
+        return events
+
+    @staticmethod
+    def _payloads(entries) -> list[ClaimedEvent]:
+        return [(entry_id, fields["e"]) for entry_id, fields in entries if fields and "e" in fields]
+
+    async def ack(self, entry_ids: list[str]) -> None:
+        if entry_ids:
+            await self.redis.xack(self.key, self.group, *entry_ids)
+
+    async def release(self, events: list[ClaimedEvent]) -> None:
+        # Unacknowledged entries stay pending and are reclaimed after claim_idle_ms
+        return None
+
+    async def metrics(self) -> dict:
+        """Backlog of the consumer group: entries not yet delivered (lag) plus delivered but unacked.
+
+        XLEN is reported separately as ``retained``: acked entries stay in the
+        stream until MAXLEN trims them, so it measures history, not backlog.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(self.key)
+            pipe.xinfo_groups(self.key)
+            length, groups = await pipe.execute()
+        group = next((g for g in groups if g["name"] == self.group), None)
+        pending = group["pending"] if group else 0
+        # lag needs Redis 7+ and is nil while it cannot be computed (e.g. after XDEL)
+        lag = group.get("lag") if group else 0
+        return {
+            "backend": "stream",
+            "queue_length": lag + pending if lag is not None else None,
+            "lag": lag,
+            "pending": pending,
+            "retained": length,
+            "consumer": self.consumer,
+        }
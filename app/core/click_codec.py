@@ -0,0 +1,79 @@
+import json
+import time
+from datetime import datetime, UTC
+from functools import lru_cache
+from typing import Optional
+
+# Wire format v1: "1|<epoch seconds>|<short_code>|<visitor_id>". Short codes and
+# visitor ids never contain "|". The Redis client decodes replies as UTF-8, so
+# the format stays plain ASCII text rather than packed binary.
+WIRE_VERSION = "1"
+SEPARATOR = "|"
+
+DecodedClick = tuple[int, "ClickEvent"]
+DecodeError = tuple[int, str]
+
+
+class ClickEvent:
+    """Represents a single click event for a short URL."""
+
+    __slots__ = ("short_code", "timestamp", "visitor_id")
+
+    def __init__(self, short_code: str, timestamp: Optional[int] = None, visitor_id: Optional[str] = None):
+        self.short_code = short_code
+        # Unix epoch seconds
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self.visitor_id = visitor_id
+
+    def encode(self) -> str:
+        return SEPARATOR.join((WIRE_VERSION, str(self.timestamp), self.short_code, self.visitor_id or ""))
+
+    @property
+    def occurred_at(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, UTC)
+
+    @property
+    def date_key(self) -> str:
+        return day_key(self.timestamp)
+
+
+def day_key(timestamp: int) -> str:
+    """YYYYMMDD (UTC) of an epoch timestamp."""
+    return _day_key(timestamp // 86400)
+
+
+@lru_cache(maxsize=64)
+def _day_key(day: int) -> str:
+    # A batch spans very few days, so this is computed a handful of times per batch
+    return datetime.fromtimestamp(day * 86400, UTC).strftime("%Y%m%d")
+
+
+def decode_clicks(payloads: list[str]) -> tuple[list[DecodedClick], list[DecodeError]]:
+    """Decode a batch of payloads into ``(index, ClickEvent)`` and ``(index, error)`` lists.
+
+    v1 payloads are split in one pass without any JSON or ISO-8601 parsing;
+    JSON payloads queued before the compact format are still accepted.
+    """
+    decoded: list[DecodedClick] = []
+    errors: list[DecodeError] = []
+    for i, payload in enumerate(payloads):
+        try:
+            if payload.startswith("{"):
+                decoded.append((i, _decode_json(payload)))
+                continue
+            version, timestamp, short_code, visitor_id = payload.split(SEPARATOR)
+            if version != WIRE_VERSION or not short_code:
+                raise ValueError(f"Unsupported click event: {payload!r}")
+            decoded.append((i, ClickEvent(short_code, int(timestamp), visitor_id or None)))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            errors.append((i, str(e)))
+    return decoded, errors
+
+
+def _decode_json(payload: str) -> ClickEvent:
+    """Compatibility reader for ``{"short_code", "timestamp": isoformat, "visitor"}`` events."""
+    data = json.loads(payload)
+    timestamp = datetime.fromisoformat(data["timestamp"])
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=UTC)
+    return ClickEvent(data["short_code"], int(timestamp.timestamp()), data.get("visitor"))
@@ -1,27 +1,91 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
+from pydantic import ConfigDict, model_validator
 
 class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str
     TEST_DATABASE_URL: str
     DB_ECHO: bool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 500
 
     # Redis settings
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_USE_HIREDIS: bool = True
     URL_TTL: int
     STATS_TTL: int
+    URL_NEGATIVE_TTL: int = 30
+    L1_CACHE_ENABLED: bool = True
+    L1_CACHE_MAX_SIZE: int = 10000
+    L1_CACHE_TTL: int = 60
+    URL_FILL_LOCK_MS: int = 0
+    URL_REFRESH_AHEAD: int = 60
+    STATS_QUEUE_MAX_LENGTH: int = 100000
+    STATS_BATCH_SIZE: int = 100
+    STATS_BACKEND: Literal["list", "stream"] = "list"
+    STATS_STREAM_GROUP: str = "stats-workers"
+    STATS_STREAM_CLAIM_IDLE_MS: int = 60000
+    STATS_STREAM_MAX_DELIVERIES: int = 5
+    STATS_LAYOUT: Literal["hash", "bucketed"] = "bucketed"
+    STATS_MINUTE_RETENTION: int = 172800
+    STATS_HOUR_RETENTION: int = 2592000
+    STATS_DAY_RETENTION: int = 7776000
+    TRENDING_CACHE_TTL: int = 10
+    TRENDING_BUCKET_MAX_SIZE: int = 10000
+    TRENDING_LOCK_MS: int = 1000
+    STATS_CLEANUP_SCAN_COUNT: int = 1000
+    CLICK_FLUSH_INTERVAL: float = 60.0
+    CLICK_ARCHIVE_ENABLED: bool = True
+    CLICK_ARCHIVE_RETENTION_DAYS: int = 90
+    CLICK_ARCHIVE_PARTITIONS_AHEAD: int = 3
+    STATS_CLEANUP_PAUSE: float = 0.01
 
     # Google Safe Browsing API
     GOOGLE_SAFE_BROWSING_API_KEY: Optional[str] = None
+    SAFE_BROWSING_API_URL: str = "https://safebrowsing.googleapis.com/v4"
+    SAFE_BROWSING_MAX_CONNECTIONS: int = 20
+    SAFE_BROWSING_KEEPALIVE: float = 30.0
+    SAFE_BROWSING_TIMEOUT: float = 5.0
+    SAFE_BROWSING_SAFE_TTL: int = 300
+    # Let URLs through unchecked when the API answers with an error status (quota, outage)
+    SAFE_BROWSING_FAIL_OPEN: bool = True
+    SAFE_BROWSING_BATCH_SIZE: int = 500
+    SAFE_BROWSING_BATCH_WAIT_MS: int = 5
+    SAFE_BROWSING_MODE: Literal["lookup", "update"] = "lookup"
+    SAFE_BROWSING_UPDATE_INTERVAL: int = 1800
 
     # Application settings
     APP_NAME: str
     DEBUG: bool
     SECRET_KEY: str
     BASE_URL: str
+    # Required in the X-Admin-Key header of admin endpoints; they are disabled when unset
+    ADMIN_API_KEY: Optional[str] = None
+    SHORT_CODE_GENERATOR: Literal["sequence", "hash", "random", "pool"] = "sequence"
+    SHORT_CODE_ID_ALLOCATOR: Literal["postgres", "redis"] = "postgres"
+    CODE_POOL_TARGET_SIZE: int = 10000
+    CODE_POOL_LOW_WATER: int = 2000
+    CODE_POOL_REFILL_INTERVAL: float = 1.0
 
     model_config = ConfigDict(env_file=".env", case_sensitive=True, extra="allow")
 
+    @model_validator(mode="after")
+    def check_stats_retention(self) -> "Settings":
+        # Coarser buckets answer the older ranges, so each must outlive the finer ones
+        if not self.STATS_MINUTE_RETENTION <= self.STATS_HOUR_RETENTION <= self.STATS_DAY_RETENTION:
+            raise ValueError(
+                "STATS_MINUTE_RETENTION <= STATS_HOUR_RETENTION <= STATS_DAY_RETENTION is required"
+            )
+        return self
+
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,166 @@
+import logging
+from typing import Callable, Optional
+
+from redis.asyncio import Redis, ConnectionPool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.cache.redis import CacheManagerProtocol, RedisCacheManager, create_redis_pool, redis_pool_stats
+from app.cache.local import LocalCache, LocalCacheManager
+from app.cache.invalidation import CacheInvalidator
+from app.core.config import Settings
+from app.core.single_flight import SingleFlight
+from app.core.stats_layouts import create_stats_layout
+from app.core.stats_queue import StatsQueue
+from app.db.click_archive import ClickArchive, ClickPartitionManager
+from app.db.repository import ShortUrlReader
+from app.db.session import async_session, db_pool_stats, engine as default_engine
+from app.db.models import ID_BLOCK_SIZE
+from app.services.click_flusher import ClickCountFlusher
+from app.services.code_pool import CodePool
+from app.services.generators import (
+    BlockSequenceGenerator, HashBasedGenerator, IdBlockAllocator, PooledRandomGenerator,
+    PostgresSequenceAllocator, RandomGenerator, RedisBlockAllocator, ShortCodeGenerator
+)
+from app.services.safe_browsing_local import LocalThreatDatabase
+from app.services.url_validator import URLValidator
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Long-lived services of one worker.
+
+    Built once in lifespan and stored on ``app.state.container``; request
+    dependencies only read attributes from it instead of constructing objects.
+    Every service that talks to PostgreSQL uses ``engine``, so tests can point
+    the whole container at their own database.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        engine: AsyncEngine = default_engine,
+        session_factory: Optional[Callable[[], AsyncSession]] = None
+    ):
+        self.settings = settings
+        self.engine = engine
+        if session_factory is None:
+            session_factory = async_session if engine is default_engine else sessionmaker(
+                engine, class_=AsyncSession, expire_on_commit=False
+            )
+        self.session_factory = session_factory
+        self.redis_pool: ConnectionPool = create_redis_pool(settings)
+        self.redis = Redis(connection_pool=self.redis_pool)
+        self.stats_layout = create_stats_layout(settings)
+        self.url_cache = LocalCache(maxsize=settings.L1_CACHE_MAX_SIZE)
+        self.cache_manager = self._create_cache_manager()
+        self.cache_invalidator = CacheInvalidator(self.redis, self.url_cache)
+        self.single_flight = SingleFlight()
+        self.url_reader = ShortUrlReader(self.engine)
+        self.code_pool: Optional[CodePool] = None
+        self.click_archive: Optional[ClickArchive] = None
+        self.click_partitions: Optional[ClickPartitionManager] = None
+        if settings.CLICK_ARCHIVE_ENABLED:
+            self.click_archive = ClickArchive(self.engine)
+            self.click_partitions = ClickPartitionManager(
+                self.engine,
+                days_ahead=settings.CLICK_ARCHIVE_PARTITIONS_AHEAD,
+                retention_days=settings.CLICK_ARCHIVE_RETENTION_DAYS
+            )
+        self.stats_queue = StatsQueue(
+            redis=self.redis, settings=settings, layout=self.stats_layout, archive=self.click_archive
+        )
+        self.click_flusher: Optional[ClickCountFlusher] = None
+        if settings.CLICK_FLUSH_INTERVAL > 0:
+            self.click_flusher = ClickCountFlusher(self.redis, self.engine, interval=settings.CLICK_FLUSH_INTERVAL)
+        self.url_validator = URLValidator(settings, redis=self.redis, local_db=self._create_local_threat_db())
+        self.generator = self._create_generator()
+
+    def _create_cache_manager(self) -> CacheManagerProtocol:
+        """RedisCacheManager, behind the L1 cache unless it is disabled."""
+        cache_manager = RedisCacheManager(self.redis, stats_layout=self.stats_layout)
+        if not self.settings.L1_CACHE_ENABLED:
+            return cache_manager
+        return LocalCacheManager(
+            inner=cache_manager,
+            cache=self.url_cache,
+            ttl=min(self.settings.L1_CACHE_TTL, self.settings.URL_TTL),
+            negative_ttl=self.settings.URL_NEGATIVE_TTL
+        )
+
+    def _create_local_threat_db(self) -> Optional[LocalThreatDatabase]:
+        """Local Safe Browsing prefix database when SAFE_BROWSING_MODE is "update"."""
+        if self.settings.SAFE_BROWSING_MODE != "update" or not self.settings.GOOGLE_SAFE_BROWSING_API_KEY:
+            return None
+        return LocalThreatDatabase(self.settings)
+
+    def _create_generator(self) -> ShortCodeGenerator:
+        """Short code generator selected by SHORT_CODE_GENERATOR."""
+        if self.settings.SHORT_CODE_GENERATOR == "hash":
+            return HashBasedGenerator(salt=self.settings.SECRET_KEY)
+        if self.settings.SHORT_CODE_GENERATOR == "random":
+            return RandomGenerator()
+        if self.settings.SHORT_CODE_GENERATOR == "pool":
+            self.code_pool = CodePool(
+                redis=self.redis,
+                reader=self.url_reader,
+                target_size=self.settings.CODE_POOL_TARGET_SIZE,
+                low_water=self.settings.CODE_POOL_LOW_WATER,
+                refill_interval=self.settings.CODE_POOL_REFILL_INTERVAL
+            )
+            return PooledRandomGenerator(self.code_pool)
+        allocator: IdBlockAllocator
+        if self.settings.SHORT_CODE_ID_ALLOCATOR == "redis":
+            allocator = RedisBlockAllocator(self.redis, block_size=ID_BLOCK_SIZE)
+        else:
+            allocator = PostgresSequenceAllocator(self.engine)
+        return BlockSequenceGenerator(allocator, salt=self.settings.SECRET_KEY)
+
+    async def start(self) -> None:
+        """Open sessions and start the background tasks."""
+        await self.url_validator.start()
+        if self.click_partitions:
+            # Partitions must exist before the stats processor COPYs into them
+            await self.click_partitions.start()
+        await self.stats_queue.initialize()
+        await self.cache_invalidator.start()
+        if self.code_pool:
+            await self.code_pool.start()
+        if self.click_flusher:
+            await self.click_flusher.start()
+        logger.info("Service container started")
+
+    async def aclose(self) -> None:
+        """Stop background tasks and release connections."""
+        await self.cache_invalidator.stop()
+        if self.code_pool:
+            await self.code_pool.stop()
+        if self.click_flusher:
+            await self.click_flusher.stop()
+        await self.stats_queue.shutdown()
+        if self.click_partitions:
+            await self.click_partitions.stop()
+        await self.url_validator.close()
+        await self.redis.aclose()
+        await self.redis_pool.disconnect()
+        logger.info("Service container closed")
+
+    async def metrics(self) -> dict:
+        """Runtime metrics of the long-lived services."""
+        metrics = {
+            "stats_queue": await self.stats_queue.metrics(),
+            "url_cache": self.url_cache.stats(),
+            "url_single_flight": self.single_flight.stats(),
+            "redis_pool": redis_pool_stats(self.redis_pool),
+            "db_pool": db_pool_stats(self.engine),
+            "url_validator": self.url_validator.metrics(),
+            "safe_browsing_batcher": self.url_validator.batcher.stats(),
+        }
+        if self.code_pool:
+            metrics["code_pool"] = await self.code_pool.metrics()
+        if self.click_flusher:
+            metrics["click_flusher"] = await self.click_flusher.metrics()
+        if self.click_archive:
+            metrics["click_archive"] = self.click_archive.metrics()
+        return metrics
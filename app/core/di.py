@@ -1,66 +1,96 @@
 from typing import Callable, AsyncGenerator
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 
-from app.cache.redis import CacheManagerProtocol, RedisCacheManager, get_redis
+from app.cache.redis import CacheManagerProtocol
+from app.cache.invalidation import CacheInvalidator
 from app.db.repository import ShortUrlRepository
-from app.db.session import async_session, get_db
-from app.services.generators import HashBasedGenerator, ShortCodeGenerator
+from app.db.session import get_db
+from app.services.generators import ShortCodeGenerator
 from app.services.shortener import ShortenService
+from app.services.url_validator import URLValidator
+from app.core.container import ServiceContainer
 from app.core.stats_queue import StatsQueue
 from app.core.config import settings, Settings
 from app.controllers.url import URLController
 
 
+async def get_container(request: Request) -> ServiceContainer:
+    """Dependency that provides the worker's ServiceContainer (created in lifespan)."""
+    return request.app.state.container
+
+
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     """Dependency that provides a SQLAlchemy session for database operations."""
     async for session in get_db():
         yield session
 
 
-async def get_short_url_repository(db_session: AsyncSession = Depends(get_db_session)) -> ShortUrlRepository:
+async def get_redis(container: ServiceContainer = Depends(get_container)) -> Redis:
+    """Dependency that provides the shared Redis client."""
+    return container.redis
+
+
+async def get_cache_invalidator(container: ServiceContainer = Depends(get_container)) -> CacheInvalidator:
+    """Dependency that provides a CacheInvalidator for publishing URL changes."""
+    return container.cache_invalidator
+
+
+async def get_short_url_repository(
+    db_session: AsyncSession = Depends(get_db_session),
+    invalidator: CacheInvalidator = Depends(get_cache_invalidator)
+) -> ShortUrlRepository:
     """Dependency that provides a ShortUrlRepository instance."""
-    return ShortUrlRepository(db_session)
+    return ShortUrlRepository(db_session, invalidator=invalidator)
+
+
+async def get_cache_manager(container: ServiceContainer = Depends(get_container)) -> CacheManagerProtocol:
+    """Dependency that provides a CacheManager instance (RedisCacheManager behind the L1 cache)."""
+    return container.cache_manager
 
 
-async def get_cache_manager(redis: Redis = Depends(get_redis)) -> CacheManagerProtocol:
-    """Dependency that provides a CacheManager instance (RedisCacheManager)."""
-    return RedisCacheManager(redis)
+async def get_short_code_generator(container: ServiceContainer = Depends(get_container)) -> ShortCodeGenerator:
+    """Dependency that provides a ShortCodeGenerator instance."""
+    return container.generator
 
 
-def get_short_code_generator() -> ShortCodeGenerator:
-    """Dependency that provides a ShortCodeGenerator instance (HashBasedGenerator)."""
-    return HashBasedGenerator()
+async def get_stats_queue(container: ServiceContainer = Depends(get_container)) -> StatsQueue:
+    """Dependency that provides the StatsQueue instance."""
+    return container.stats_queue
 
 
-async def get_stats_queue(redis: Redis = Depends(get_redis)) -> StatsQueue:
-    """Dependency that provides a StatsQueue instance."""
-    return StatsQueue(redis=redis, settings=settings)
+async def get_url_validator(container: ServiceContainer = Depends(get_container)) -> URLValidator:
+    """Dependency that provides the URLValidator with its long-lived HTTP session."""
+    return container.url_validator
 
 
 async def get_shorten_service(
     db_session: AsyncSession = Depends(get_db_session),
-    generator: ShortCodeGenerator = Depends(get_short_code_generator),
-    cache_manager: CacheManagerProtocol = Depends(get_cache_manager),
     repository: ShortUrlRepository = Depends(get_short_url_repository),
-    stats_queue: StatsQueue = Depends(get_stats_queue)
+    container: ServiceContainer = Depends(get_container)
 ) -> ShortenService:
     """Dependency that provides a ShortenService instance."""
     return ShortenService(
         db_session=db_session,
-        generator=generator,
-        cache_manager=cache_manager,
+        generator=container.generator,
+        cache_manager=container.cache_manager,
         repository=repository,
-        stats_queue=stats_queue,
-        settings=settings
+        stats_queue=container.stats_queue,
+        settings=container.settings,
+        single_flight=container.single_flight,
+        session_factory=container.session_factory,
+        validator=container.url_validator,
+        reader=container.url_reader
     )
 
 
-def get_db_session_factory() -> Callable[[], AsyncSession]:
-    """Provides a factory function for SQLAlchemy sessions, used by background tasks."""
-    return async_session
+async def get_db_session_factory(
+    container: ServiceContainer = Depends(get_container)
+) -> Callable[[], AsyncSession]:
+    """Provides the container's session factory, used by background tasks."""
+    return container.session_factory
 
 
 async def get_settings() -> Settings:
@@ -73,4 +103,4 @@ async def get_url_controller(
     settings: Settings = Depends(get_settings)
 ) -> URLController:
     """Dependency that provides a URLController instance."""
-    return URLController(shorten_service=shorten_service, settings=settings) 
\ No newline at end of file
+    return URLController(shorten_service=shorten_service, settings=settings)
@@ -10,6 +10,11 @@ class URLValidationError(HTTPException):
     def __init__(self, detail: str):
         super().__init__(status_code=400, detail=detail)
 
+class AdminAccessError(HTTPException):
+    """當管理 API 金鑰缺少或錯誤時拋出的異常"""
+    def __init__(self, detail: str):
+        super().__init__(status_code=403, detail=detail)
+
 class URLServiceError(HTTPException):
     """當URL服務發生錯誤時拋出的異常"""
     def __init__(self, detail: str):
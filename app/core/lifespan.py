@@ -1,23 +1,18 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.core.di import get_redis
-from app.core.stats_queue import StatsQueue
+from app.core.container import ServiceContainer
 from app.db.session import Base, engine
 from app.core.config import settings
 
-# Global stats queue instance
-stats_queue = None
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global stats_queue
-    # Startup
-    async with engine.begin() as conn:
+    # Startup; tests point the app at their own database through app.state.db_engine
+    db_engine = getattr(app.state, "db_engine", engine)
+    async with db_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    redis = await get_redis().__anext__()
-    stats_queue = StatsQueue(redis=redis, settings=settings)
-    await stats_queue.initialize()
+    container = ServiceContainer(settings, engine=db_engine)
+    await container.start()
+    app.state.container = container
     yield
     # Shutdown
-    if stats_queue:
-        await stats_queue.shutdown()
\ No newline at end of file
+    await container.aclose()
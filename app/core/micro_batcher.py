@@ -0,0 +1,71 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class MicroBatcher(Generic[K, V]):
+    """Collects keys submitted by concurrent callers and resolves them in one call.
+
+    A batch is flushed once ``max_batch_size`` keys are pending or ``max_wait``
+    seconds after its first key arrived, whichever comes first. ``fn`` receives
+    the distinct keys of the batch and returns a result per key; each waiting
+    caller gets the result for its own key, or the exception ``fn`` raised.
+    """
+
+    def __init__(self, fn: Callable[[list[K]], Awaitable[dict[K, V]]], max_batch_size: int, max_wait: float):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: list[tuple[K, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.submitted = 0
+        self.batches = 0
+
+    async def submit(self, key: K) -> Optional[V]:
+        """Queue ``key`` for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, future))
+        self.submitted += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[K, asyncio.Future]]) -> None:
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        try:
+            results = await self.fn(keys)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch:
+            # Callers that were cancelled while waiting are skipped
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "in_flight": len(self._tasks),
+            "submitted": self.submitted,
+            "batches": self.batches,
+        }
@@ -0,0 +1,107 @@
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+from typing import Literal
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from app.core.stats_layouts import StatsLayout, stats_key_prefix
+
+Granularity = Literal["minute", "hour", "day"]
+
+# Upper bound on buckets returned by one range query
+MAX_BUCKETS = {"minute": 1440, "hour": 744, "day": 366}
+BUCKET_SIZE = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+LABEL_FORMAT = {"minute": "%Y%m%d%H%M", "hour": "%Y%m%d%H", "day": "%Y%m%d"}
+# Range covered when only the end is given: the last hour, day or week
+DEFAULT_SPAN = {"minute": timedelta(minutes=59), "hour": timedelta(hours=23), "day": timedelta(days=6)}
+
+
+def minute_key(short_code: str, hour: datetime) -> str:
+    """Hash of one code's per-minute counts within an hour (fields ``MM``)."""
+    return f"{stats_key_prefix(short_code)}m:{hour:%Y%m%d%H}"
+
+
+def hour_key(short_code: str, day: datetime) -> str:
+    """Hash of one code's per-hour counts within a day (fields ``HH``)."""
+    return f"{stats_key_prefix(short_code)}h:{day:%Y%m%d}"
+
+
+def floor_time(moment: datetime, granularity: Granularity) -> datetime:
+    # Naive datetimes are taken as UTC
+    moment = moment.replace(tzinfo=UTC) if moment.tzinfo is None else moment.astimezone(UTC)
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class ClickRollups:
+    """Minute and hour rollups of click counts next to the layout's day buckets.
+
+    Minutes live in one hash per code and hour, hours in one hash per code and
+    day, each expiring after its own retention. Day counts come from the
+    configured StatsLayout. A range query reads only the hashes covering the
+    requested buckets, with HMGET for just the fields it needs, in one pipeline.
+    """
+
+    def __init__(self, layout: StatsLayout, minute_retention: int, hour_retention: int):
+        self.layout = layout
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+
+    def record(self, pipe: Pipeline, minute_counts: Counter) -> None:
+        """Queue HINCRBYs for ``{(short_code, epoch_minute): count}`` on ``pipe``."""
+        hour_counts: Counter = Counter()
+        expiries: dict[str, int] = {}
+        for (short_code, epoch_minute), count in minute_counts.items():
+            minute = datetime.fromtimestamp(epoch_minute * 60, UTC)
+            hour = minute.replace(minute=0)
+            key = minute_key(short_code, hour)
+            pipe.hincrby(key, f"{minute:%M}", count)
+            expiries[key] = int((hour + timedelta(hours=1)).timestamp()) + self.minute_retention
+            hour_counts[(short_code, hour)] += count
+        for (short_code, hour), count in hour_counts.items():
+            day = hour.replace(hour=0)
+            key = hour_key(short_code, day)
+            pipe.hincrby(key, f"{hour:%H}", count)
+            expiries[key] = int((day + timedelta(days=1)).timestamp()) + self.hour_retention
+        for key, expires_at in expiries.items():
+            pipe.expireat(key, expires_at)
+
+    async def read(
+        self, redis: Redis, short_code: str, start: datetime, end: datetime, granularity: Granularity
+    ) -> dict[str, int]:
+        """Click counts per bucket from ``start`` to ``end`` (inclusive), labelled like LABEL_FORMAT."""
+        buckets = bucket_range(start, end, granularity)
+        labels = [bucket.strftime(LABEL_FORMAT[granularity]) for bucket in buckets]
+        if granularity == "day":
+            clicks, _ = await self.layout.read(redis, short_code, labels)
+            return clicks
+
+        # Group the requested buckets by the hash that holds them
+        fields: dict[str, list[str]] = {}
+        for bucket in buckets:
+            if granularity == "minute":
+                fields.setdefault(minute_key(short_code, bucket.replace(minute=0)), []).append(f"{bucket:%M}")
+            else:
+                fields.setdefault(hour_key(short_code, bucket.replace(hour=0)), []).append(f"{bucket:%H}")
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, names in fields.items():
+                pipe.hmget(key, names)
+            replies = await pipe.execute()
+        counts = [int(count or 0) for reply in replies for count in reply]
+        return dict(zip(labels, counts))
+
+
+def bucket_range(start: datetime, end: datetime, granularity: Granularity) -> list[datetime]:
+    """Bucket start times covering ``start``..``end``; raises ValueError for invalid or oversized ranges."""
+    first, last = floor_time(start, granularity), floor_time(end, granularity)
+    if first > last:
+        raise ValueError("from must not be after to")
+    step = BUCKET_SIZE[granularity]
+    count = int((last - first) / step) + 1
+    if count > MAX_BUCKETS[granularity]:
+        raise ValueError(f"Range exceeds {MAX_BUCKETS[granularity]} {granularity} buckets")
+    return [first + step * i for i in range(count)]
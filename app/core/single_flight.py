@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls for the same key within this process.
+
+    The first caller starts the work as a task; callers arriving while it runs
+    await the same task instead of repeating the work. The task is shielded so
+    a cancelled caller does not cancel it for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` once for all concurrent callers of ``key`` and share its result."""
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is None:
+            task = self._start(key, fn)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def spawn(self, key: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        """Start ``fn`` in the background unless a call for ``key`` is already running."""
+        if key not in self._calls:
+            self._start(key, fn)
+
+    def _start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.create_task(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return task
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
+
@@ -0,0 +1,132 @@
+import abc
+from datetime import datetime, timedelta, UTC
+from typing import Iterable, Protocol
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from app.core.config import Settings
+
+
+def stats_key_prefix(short_code: str) -> str:
+    """Common prefix of every stats key of a short code, whatever the layout."""
+    return f"url:stats:{short_code}:"
+
+
+def uniques_key(short_code: str, date_key: str) -> str:
+    return f"url:uniques:{short_code}:{date_key}"
+
+
+def bucket_expiry(date_key: str, retention: int) -> int:
+    """Unix time at which a day bucket expires: ``retention`` seconds after the day ends."""
+    day_end = datetime.strptime(date_key, "%Y%m%d").replace(tzinfo=UTC) + timedelta(days=1)
+    return int(day_end.timestamp()) + retention
+
+
+class StatsLayout(Protocol):
+    """How per-day click counters and unique-visitor estimates are laid out in Redis."""
+
+    # Whether old data has to be removed by the retention sweep
+    needs_sweep: bool
+
+    def record(self, pipe: Pipeline, short_code: str, date_key: str, clicks: int, visitors: Iterable[str]) -> None:
+        """Queue the writes for one (short_code, day) on ``pipe``."""
+        ...
+
+    async def read(
+        self, redis: Redis, short_code: str, date_keys: list[str]
+    ) -> tuple[dict[str, int], dict[str, int]]:
+        """Clicks and unique visitors per day, fetched in one pipelined round trip."""
+        ...
+
+    async def read_many(
+        self, redis: Redis, short_codes: list[str], date_keys: list[str]
+    ) -> dict[str, tuple[dict[str, int], dict[str, int]]]:
+        """``read`` for many short codes, still in one pipelined round trip."""
+        ...
+
+
+class _LayoutBase(abc.ABC):
+    retention: int
+
+    @abc.abstractmethod
+    def _queue_counts(self, pipe: Pipeline, short_code: str, date_keys: list[str]) -> None:
+        """Queue one command returning the counts of ``date_keys`` in order."""
+
+    async def read(
+        self, redis: Redis, short_code: str, date_keys: list[str]
+    ) -> tuple[dict[str, int], dict[str, int]]:
+        return (await self.read_many(redis, [short_code], date_keys))[short_code]
+
+    async def read_many(
+        self, redis: Redis, short_codes: list[str], date_keys: list[str]
+    ) -> dict[str, tuple[dict[str, int], dict[str, int]]]:
+        if not short_codes:
+            return {}
+        async with redis.pipeline(transaction=False) as pipe:
+            for short_code in short_codes:
+                self._queue_counts(pipe, short_code, date_keys)
+                for date_key in date_keys:
+                    pipe.pfcount(uniques_key(short_code, date_key))
+            replies = iter(await pipe.execute())
+        stats = {}
+        for short_code in short_codes:
+            counts = next(replies)
+            uniques = [next(replies) for _ in date_keys]
+            stats[short_code] = (
+                {date_key: int(count or 0) for date_key, count in zip(date_keys, counts)},
+                dict(zip(date_keys, uniques)),
+            )
+        return stats
+
+    def _record_visitors(self, pipe: Pipeline, short_code: str, date_key: str, visitors: Iterable[str]) -> None:
+        visitors = list(visitors)
+        if visitors:
+            key = uniques_key(short_code, date_key)
+            pipe.pfadd(key, *visitors)
+            pipe.expireat(key, bucket_expiry(date_key, self.retention))
+
+
+class HashStatsLayout(_LayoutBase):
+    """Legacy layout: one ``url:stats:{code}:daily`` hash per code, trimmed by the sweep."""
+
+    needs_sweep = True
+
+    def __init__(self, retention: int):
+        self.retention = retention
+
+    def record(self, pipe: Pipeline, short_code: str, date_key: str, clicks: int, visitors: Iterable[str]) -> None:
+        pipe.hincrby(f"{stats_key_prefix(short_code)}daily", date_key, clicks)
+        self._record_visitors(pipe, short_code, date_key, visitors)
+
+    def _queue_counts(self, pipe: Pipeline, short_code: str, date_keys: list[str]) -> None:
+        pipe.hmget(f"{stats_key_prefix(short_code)}daily", date_keys)
+
+
+class BucketedStatsLayout(_LayoutBase):
+    """One ``url:stats:{code}:{YYYYMMDD}`` counter per code and day with native expiry.
+
+    Buckets expire ``retention`` seconds after their day ends, so memory stays
+    bounded without any sweep.
+    """
+
+    needs_sweep = False
+
+    def __init__(self, retention: int):
+        self.retention = retention
+
+    def record(self, pipe: Pipeline, short_code: str, date_key: str, clicks: int, visitors: Iterable[str]) -> None:
+        key = f"{stats_key_prefix(short_code)}{date_key}"
+        pipe.incrby(key, clicks)
+        pipe.expireat(key, bucket_expiry(date_key, self.retention))
+        self._record_visitors(pipe, short_code, date_key, visitors)
+
+    def _queue_counts(self, pipe: Pipeline, short_code: str, date_keys: list[str]) -> None:
+        pipe.mget([f"{stats_key_prefix(short_code)}{date_key}" for date_key in date_keys])
+
+
+def create_stats_layout(settings: Settings) -> StatsLayout:
+    """Stats key layout selected by STATS_LAYOUT, retaining data for STATS_DAY_RETENTION seconds."""
+    if settings.STATS_LAYOUT == "hash":
+        return HashStatsLayout(retention=settings.STATS_DAY_RETENTION)
+    return BucketedStatsLayout(retention=settings.STATS_DAY_RETENTION)
@@ -1,19 +1,43 @@
 import asyncio
-import json
 import logging
-import backoff
+from collections import Counter, defaultdict
+from typing import Optional
 from redis.asyncio import Redis 
-from datetime import datetime, timedelta, UTC
+from datetime import date, datetime, timedelta, UTC
 from app.core.config import Settings
+from app.core.click_codec import ClickEvent, decode_clicks
+from app.core.rollups import ClickRollups, Granularity
+from app.core.stats_layouts import StatsLayout, create_stats_layout
+from app.core.trending import TrendingTracker, TrendingWindow
+from app.db.click_archive import ClickArchive, ClickRecord
+from app.core.click_backends import (
+    ClaimedEvent, ClickBackend, ListClickBackend, StreamClickBackend, dead_letter
+)
 
 logger = logging.getLogger(__name__)
 
-class ClickEvent:
-    """Represents a single click event for a short URL."""
+# Per-code lifetime click deltas waiting to be flushed into short_urls.click_count
+CLICKS_PENDING_KEY = "url:clicks:pending"
+# Legacy hashes being migrated; still matched by the url:stats:*:daily sweep
+MIGRATING_PREFIX = "url:stats:migrating:"
 
-    def __init__(self, short_code: str):
-        self.short_code = short_code
-        self.timestamp = datetime.now(UTC)
+
+def _migrating_key(key: str) -> str:
+    short_code = key.removeprefix("url:stats:").removesuffix(":daily")
+    return f"{MIGRATING_PREFIX}{short_code}:daily"
+
+
+class VisitBatch:
+    """A claimed batch of visit events, decoded and aggregated."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.visitors: dict[tuple[str, str], set[str]] = defaultdict(set)
+        # (short_code, epoch minute) -> clicks, for the minute/hour rollups
+        self.minute_counts: Counter = Counter()
+        self.records: list[ClickRecord] = []
+        self.valid: list[ClaimedEvent] = []
+        self.failed: list[tuple[str, str, str]] = []
 
 
 class StatsQueue:
@@ -23,18 +47,57 @@ class StatsQueue:
         self,
         redis: Redis,
         settings: Settings,
-        queue_name: str = "url_stats"
+        queue_name: str = "url_stats",
+        layout: Optional[StatsLayout] = None,
+        archive: Optional[ClickArchive] = None
     ):
         self.redis = redis
         self.settings = settings
+        self.layout = layout or create_stats_layout(settings)
+        self.archive = archive
+        self.rollups = ClickRollups(
+            self.layout,
+            minute_retention=settings.STATS_MINUTE_RETENTION,
+            hour_retention=settings.STATS_HOUR_RETENTION
+        )
+        self.trending = TrendingTracker(
+            cache_ttl=settings.TRENDING_CACHE_TTL,
+            max_bucket_size=settings.TRENDING_BUCKET_MAX_SIZE,
+            lock_ms=settings.TRENDING_LOCK_MS
+        )
         self.queue_name = queue_name
+        self.max_length = settings.STATS_QUEUE_MAX_LENGTH
+        self.batch_size = settings.STATS_BATCH_SIZE
+        self.dead_letter_key = f"{queue_name}:dead"
+        self.cleanup_cursor_key = f"{queue_name}:cleanup:cursor"
+        self.cleanup_lock_key = f"{queue_name}:cleanup:lock"
+        self.backend = self._create_backend()
         self._processing_task = None
         self._stop_event = asyncio.Event()
         self._cleanup_task = None
+        self._dropped = 0
+        self._enqueue_errors = 0
+        self._archive_errors = 0
+
+    def _create_backend(self) -> ClickBackend:
+        """Build the click transport selected by STATS_BACKEND."""
+        if self.settings.STATS_BACKEND == "stream":
+            return StreamClickBackend(
+                redis=self.redis,
+                key=f"{self.queue_name}:stream",
+                max_length=self.max_length,
+                group=self.settings.STATS_STREAM_GROUP,
+                claim_idle_ms=self.settings.STATS_STREAM_CLAIM_IDLE_MS,
+                max_deliveries=self.settings.STATS_STREAM_MAX_DELIVERIES,
+                dead_letter_key=self.dead_letter_key
+            )
+        return ListClickBackend(redis=self.redis, key=self.queue_name, max_length=self.max_length)
 
     async def initialize(self) -> None:
         """Initialize the stats queue and start the processing task."""
+        await self.backend.initialize()
         self._processing_task = asyncio.create_task(self._process_visits_loop())
+        # Sweeps the hash layout, or moves legacy hashes into day buckets
         self._cleanup_task = asyncio.create_task(self._daily_cleanup_loop())
         logger.info("Stats queue initialized and processing task started")
 
@@ -44,14 +107,24 @@ class StatsQueue:
             self._stop_event.set()
             await self._processing_task
             self._processing_task = None
+        if self._cleanup_task:
+            # Safe to interrupt: the sweep resumes from its saved cursor
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
         logger.info("Stats queue shutdown complete")
 
     async def _process_visits_loop(self) -> None:
         """Background task to process visits continuously."""
         while not self._stop_event.is_set():
             try:
-                await self.process_visits()
-                await asyncio.sleep(1)  # Wait before next batch
+                processed = await self.process_visits(self.batch_size)
+                # Keep draining while batches come back full; otherwise wait for more events
+                if processed < self.batch_size:
+                    await asyncio.sleep(1)
             except Exception as e:
                 logger.error(f"Error in visit processing loop: {str(e)}")
                 await asyncio.sleep(5)  # Wait longer on error
@@ -66,132 +139,274 @@ class StatsQueue:
                 logger.error(f"Error in daily cleanup loop: {str(e)}")
                 await asyncio.sleep(3600)  # Wait 1 minute on error
 
-    @backoff.on_exception(
-        backoff.expo,
-        Exception,
-        max_tries=3,
-        max_time=30
-    )
-    async def queue_visit(self, short_code: str) -> None:
-        """Queue a URL visit for statistics processing."""
+    async def queue_visit(self, short_code: str, visitor_id: Optional[str] = None) -> None:
+        """Record a URL visit without processing it (fire-and-forget).
+
+        Only a single append to the click backend is issued, the background loop
+        does the draining. Errors are logged and swallowed so a stats outage never
+        breaks a redirect. ``visitor_id`` feeds the unique-visitor estimate.
+        """
         try:
-            visit_data = {
-                "short_code": short_code,
-                "timestamp": datetime.now(UTC).isoformat()
-            }
-            await self.redis.lpush(self.queue_name, json.dumps(visit_data))
-            logger.info(f"Queued visit for short_code: {short_code}")
-            
-            # Process visits immediately to ensure real-time updates
-            await self.process_visits()
+            dropped = await self.backend.push(ClickEvent(short_code, visitor_id=visitor_id).encode())
+            if dropped:
+                self._dropped += dropped
+                logger.warning(f"Stats queue full ({self.max_length}), dropped {dropped} oldest event(s)")
         except Exception as e:
+            self._enqueue_errors += 1
             logger.error(f"Error queueing visit for {short_code}: {str(e)}")
-            raise
 
-    async def process_visits(self, batch_size: int = 100) -> None:
-        """Process queued visits in batches."""
+    async def metrics(self) -> dict:
+        """Return backlog metrics for the stats queue."""
+        return {
+            **await self.backend.metrics(),
+            "dead_letter_length": await self.redis.xlen(self.dead_letter_key),
+            "max_length": self.max_length,
+            "dropped": self._dropped,
+            "enqueue_errors": self._enqueue_errors,
+            "archive_errors": self._archive_errors,
+        }
+
+    async def process_visits(self, batch_size: int = 100) -> int:
+        """Claim a batch of queued visits and apply them as aggregated counters.
+
+        The raw events are also COPYed into the click event archive when enabled.
+        Returns the number of events claimed from the queue.
+        """
         try:
-            # Get batch of visits
-            visits = await self.redis.lrange(self.queue_name, 0, batch_size - 1)
+            visits = await self.backend.claim(batch_size)
             if not visits:
-                return
-
-            # Process each visit
-            for visit_json in visits:
-                try:
-                    visit_data = json.loads(visit_json)
-                    await self._process_single_visit(visit_data)
-                    # Remove processed visit from queue
-                    await self.redis.lrem(self.queue_name, 1, visit_json)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error decoding visit data: {str(e)}")
-                    # Remove invalid data from queue
-                    await self.redis.lrem(self.queue_name, 1, visit_json)
-                except Exception as e:
-                    logger.error(f"Error processing visit: {str(e)}")
-                    # Mark visit as failed
-                    visit_data["error"] = str(e)
-                    visit_data["processed"] = False
-                    await self.redis.lrem(self.queue_name, 1, visit_json)
-                    await self.redis.lpush(f"{self.queue_name}:failed", json.dumps(visit_data))
+                return 0
+
+            batch = self._aggregate_visits(visits)
+            try:
+                await self._apply_counts(batch.counts, batch.visitors, batch.minute_counts)
+            except Exception:
+                await self.backend.release(batch.valid)
+                raise
+            await self._archive(batch.records)
+
+            await dead_letter(self.redis, self.dead_letter_key, [(payload, error) for _, payload, error in batch.failed])
+            await self.backend.ack([entry_id for entry_id, _ in visits])
+            logger.info(f"Processed {len(batch.valid)} visits into {len(batch.counts)} counters")
+            return len(visits)
 
         except Exception as e:
             logger.error(f"Error in process_visits: {str(e)}")
             raise
 
-    async def _process_single_visit(self, visit_data: dict) -> None:
-        """Process a single visit record."""
+    def _aggregate_visits(self, visits: list[ClaimedEvent]) -> VisitBatch:
+        """Collapse raw visit events into per-(short_code, day) counts, visitor sets and archive records."""
+        batch = VisitBatch()
+        decoded, errors = decode_clicks([payload for _, payload in visits])
+        for i, event in decoded:
+            key = (event.short_code, event.date_key)  # YYYYMMDD
+            batch.counts[key] += 1
+            batch.minute_counts[(event.short_code, event.timestamp // 60)] += 1
+            if event.visitor_id:
+                batch.visitors[key].add(event.visitor_id)
+            if self.archive:
+                batch.records.append((event.occurred_at, event.short_code, event.visitor_id))
+            batch.valid.append(visits[i])
+        for i, error in errors:
+            logger.error(f"Error decoding visit data: {error}")
+            entry_id, payload = visits[i]
+            batch.failed.append((entry_id, payload, error))
+        return batch
+
+    async def _archive(self, records: list[ClickRecord]) -> None:
+        """COPY the batch into the click event archive.
+
+        Counters are already applied at this point, so a failed archive write is
+        logged and counted rather than retried (a retry would double count).
+        """
+        if not self.archive:
+            return
         try:
-            short_code = visit_data["short_code"]
-            timestamp = datetime.fromisoformat(visit_data["timestamp"])
-            date_key = timestamp.strftime("%Y%m%d")  # Format as YYYYMMDD for consistency
-
-            # Use Redis transaction to ensure atomic updates
-            async with self.redis.pipeline(transaction=True) as pipe:
-                # Update daily stats
-                await pipe.hincrby(
-                    f"url:stats:{short_code}:daily",
-                    date_key,
-                    1
-                )                  
-                # Execute all commands atomically
-                await pipe.execute()
-
-            logger.info(f"Processed visit for {short_code} on {date_key}")
+            await self.archive.write(records)
         except Exception as e:
-            logger.error(f"Error processing visit data: {str(e)}")
-            raise
+            self._archive_errors += 1
+            logger.error(f"Error archiving {len(records)} click events: {str(e)}")
+
+    async def _apply_counts(
+        self, counts: Counter, visitors: Optional[dict] = None, minute_counts: Optional[Counter] = None
+    ) -> None:
+        """Apply aggregated counts and visitors with a single pipelined round trip.
+
+        Minute/hour rollups and trending buckets are updated in the same pipeline,
+        and lifetime deltas go to the hash that ClickCountFlusher writes to Postgres.
+        """
+        if not counts:
+            return
+        visitors = visitors or {}
+        totals: Counter = Counter()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (short_code, date_key), count in counts.items():
+                self.layout.record(pipe, short_code, date_key, count, visitors.get((short_code, date_key), ()))
+                totals[short_code] += count
+            for short_code, count in totals.items():
+                pipe.hincrby(CLICKS_PENDING_KEY, short_code, count)
+            if minute_counts:
+                self.rollups.record(pipe, minute_counts)
+                self.trending.record(pipe, minute_counts)
+            await pipe.execute()
 
     async def get_stats(self, short_code: str, created_at: datetime) -> dict:
-        """Get statistics for a URL, including daily clicks for the last 7 days."""
+        """Get statistics for a URL, including daily clicks and unique visitors for the last 7 days."""
         try:
-            raw_daily_stats = await self.redis.hgetall(f"url:stats:{short_code}:daily")
-            
-            # Calculate date range for last 7 days
             today = datetime.now(UTC).date()
-            start_date = today - timedelta(days=6)  # 7 days including today
-            
-            # Generate daily clicks for the last 7 days
-            daily_clicks = {}
-            current_date = start_date
-            
-            while current_date <= today:
-                date_str = current_date.strftime("%Y%m%d")  # Format as YYYYMMDD
-                daily_clicks[date_str] = int(raw_daily_stats.get(date_str, 0))
-                current_date += timedelta(days=1)
-
+            date_keys = [(today - timedelta(days=i)).strftime("%Y%m%d") for i in reversed(range(7))]
+            daily_clicks, daily_uniques = await self.layout.read(self.redis, short_code, date_keys)
             return {
                 "short_code": short_code,
-                "clicks": daily_clicks
+                "clicks": daily_clicks,
+                "unique_visitors": daily_uniques
             }
         except Exception as e:
             logger.error(f"Error getting stats for {short_code}: {str(e)}")
             return {
                 "short_code": short_code,
-                "clicks": {}
-            } 
-        
-    async def _cleanup_all_old_stats(self, expire_before: int = 7):
-        """Cleanup old statistics data."""
+                "clicks": {},
+                "unique_visitors": {}
+            }
+
+    async def get_stats_range(
+        self, short_code: str, start: datetime, end: datetime, granularity: Granularity
+    ) -> dict:
+        """Clicks per minute, hour or day bucket between ``start`` and ``end``.
+
+        Raises ValueError when the range is inverted or has too many buckets.
+        """
+        clicks = await self.rollups.read(self.redis, short_code, start, end, granularity)
+        return {
+            "short_code": short_code,
+            "granularity": granularity,
+            "clicks": clicks
+        }
+
+    async def get_top(self, window: TrendingWindow, n: int) -> dict:
+        """The ``n`` most clicked short codes within ``window``."""
+        return {"window": window, "items": await self.trending.top(self.redis, window, n)}
+
+    async def get_stats_many(self, short_codes: list[str], start: date, end: date) -> list[dict]:
+        """Daily clicks and unique visitors of many URLs between ``start`` and ``end`` (inclusive).
+
+        All counters come from one pipelined round trip, reading only the requested days.
+        """
+        date_keys = [
+            (start + timedelta(days=i)).strftime("%Y%m%d") for i in range((end - start).days + 1)
+        ]
+        stats = await self.layout.read_many(self.redis, short_codes, date_keys)
+        return [
+            {"short_code": short_code, "clicks": clicks, "unique_visitors": uniques}
+            for short_code, (clicks, uniques) in stats.items()
+        ]
+
+    async def _cleanup_all_old_stats(self, expire_before: Optional[int] = None) -> int:
+        """Cleanup old statistics data.
+
+        Walks ``url:stats:*:daily`` with SCAN in chunks of STATS_CLEANUP_SCAN_COUNT,
+        pipelining HKEYS/HDEL per chunk and pausing STATS_CLEANUP_PAUSE seconds
+        between chunks. The cursor is saved after every chunk so an interrupted
+        sweep resumes where it stopped, and a lock keeps workers from sweeping
+        concurrently. Returns the number of fields removed.
+
+        With a layout that needs no sweep, the same walk moves the legacy hashes
+        into the layout's day buckets instead and returns the fields moved.
+        """
         try:
-            keys = await self.redis.keys("url:stats:*:daily")
+            if not await self.redis.set(self.cleanup_lock_key, "1", nx=True, ex=3600):
+                return 0
+
+            if expire_before is None:
+                expire_before = self.layout.retention // 86400
             today = datetime.now(UTC).date()
-            expire_before = today - timedelta(days=expire_before)
+            # YYYYMMDD strings sort chronologically
+            cutoff = (today - timedelta(days=expire_before)).strftime("%Y%m%d")
+            cursor = int(await self.redis.get(self.cleanup_cursor_key) or 0)
+            removed = 0
+            try:
+                while True:
+                    cursor, keys = await self.redis.scan(
+                        cursor, match="url:stats:*:daily", count=self.settings.STATS_CLEANUP_SCAN_COUNT
+                    )
+                    if self.layout.needs_sweep:
+                        removed += await self._trim_old_fields(keys, cutoff)
+                    else:
+                        removed += await self._migrate_legacy_hashes(keys, cutoff)
+                    if cursor == 0:
+                        await self.redis.delete(self.cleanup_cursor_key)
+                        break
+                    await self.redis.set(self.cleanup_cursor_key, cursor, ex=2 * 86400)
+                    await asyncio.sleep(self.settings.STATS_CLEANUP_PAUSE)
+            finally:
+                await self.redis.delete(self.cleanup_lock_key)
 
-            for key in keys:
-                raw_daily_stats = await self.redis.hgetall(key)
-                if not raw_daily_stats:
-                    continue
-
-                key_to_delete = []
-                for date_str in raw_daily_stats:
-                    if datetime.strptime(date_str, "%Y%m%d").date() < expire_before:
-                        key_to_delete.append(date_str)
-                
-                if key_to_delete:
-                    await self.redis.hdel(key, *key_to_delete)
-                    logger.info(f"Delete old stats from {key}: {key_to_delete}")
+            action = "removed" if self.layout.needs_sweep else "migrated"
+            logger.info(f"Stats cleanup {action} {removed} fields (cutoff {cutoff})")
+            return removed
 
         except Exception as e:
             logger.error(f"Error during cleanup_all_old_stats: {str(e)}")
             raise
+
+    async def _trim_old_fields(self, keys: list[str], cutoff: str) -> int:
+        """Delete fields older than ``cutoff`` from a chunk of stats hashes in two round trips."""
+        if not keys:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hkeys(key)
+            fields_per_key = await pipe.execute()
+
+        stale = {
+            key: [field for field in fields if field < cutoff]
+            for key, fields in zip(keys, fields_per_key)
+        }
+        stale = {key: fields for key, fields in stale.items() if fields}
+        if not stale:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, fields in stale.items():
+                pipe.hdel(key, *fields)
+            await pipe.execute()
+        return sum(len(fields) for fields in stale.values())
+
+    async def _migrate_legacy_hashes(self, keys: list[str], cutoff: str) -> int:
+        """Move the fields of legacy ``:daily`` hashes from ``cutoff`` on into day buckets.
+
+        Each hash is first RENAMEd to a temporary key, so increments a worker still
+        on the hash layout makes meanwhile land in a new hash for the next sweep
+        instead of being deleted unread. The bucket increments and the DEL of the
+        temporary keys run in one MULTI/EXEC, so an interrupted run never counts a
+        day twice; temporary keys it left behind are picked up by the next sweep.
+        Older fields are dropped.
+        """
+        if not keys:
+            return 0
+        legacy = [key for key in keys if not key.startswith(MIGRATING_PREFIX)]
+        claimed = [key for key in keys if key.startswith(MIGRATING_PREFIX)]
+        if legacy:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in legacy:
+                    # NX keeps a leftover temporary key; this hash then waits for the next sweep
+                    pipe.renamenx(key, _migrating_key(key))
+                renamed = await pipe.execute(raise_on_error=False)
+            claimed += [_migrating_key(key) for key, ok in zip(legacy, renamed) if ok is True]
+        if not claimed:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in claimed:
+                pipe.hgetall(key)
+            hashes = await pipe.execute()
+
+        moved = 0
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for key, fields in zip(claimed, hashes):
+                short_code = key.removeprefix(MIGRATING_PREFIX).removesuffix(":daily")
+                for date_key, clicks in fields.items():
+                    if date_key >= cutoff and int(clicks):
+                        self.layout.record(pipe, short_code, date_key, int(clicks), ())
+                        moved += 1
+                pipe.delete(key)
+            await pipe.execute()
+        return moved
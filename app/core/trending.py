@@ -0,0 +1,150 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, UTC
+from typing import Literal
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from app.cache.locks import acquire_lock, release_lock
+
+TrendingWindow = Literal["5m", "1h", "24h", "7d"]
+
+# Bucket series: bucket length in minutes and how long a bucket is kept
+BUCKETS = {"5m": (5, 2 * 3600), "1h": (60, 8 * 86400)}
+# Window -> (bucket series, number of most recent buckets it spans)
+WINDOWS = {"5m": ("5m", 1), "1h": ("5m", 12), "24h": ("1h", 24), "7d": ("1h", 168)}
+# Daily rollups of the hourly buckets, kept for as long as a 7d window can reach them
+DAY_RETENTION = 8 * 86400
+
+
+def bucket_key(series: str, bucket: int) -> str:
+    """Sorted set of clicks per short code within one bucket."""
+    start = datetime.fromtimestamp(bucket * BUCKETS[series][0] * 60, UTC)
+    return f"url:trending:{series}:{start:%Y%m%d%H%M}"
+
+
+def day_key(day: int) -> str:
+    """Sorted set of clicks per short code over one UTC day, rolled up from its hourly buckets."""
+    return f"url:trending:1d:{datetime.fromtimestamp(day * 86400, UTC):%Y%m%d}"
+
+
+def _window_buckets(series: str, current: int, count: int) -> tuple[list[str], list[int]]:
+    """Keys covering the ``count`` most recent buckets, and the days among them served by rollups.
+
+    An hourly window uses the daily rollup for every whole day in it that closed
+    at least an hour ago, so late events have landed in its buckets, and hourly
+    buckets for the rest: a 7d window unions about 30 keys instead of 168.
+    """
+    if series != "1h":
+        return [bucket_key(series, current - i) for i in range(count)], []
+    keys, days = [], []
+    hour = current - count + 1
+    while hour <= current:
+        if hour % 24 == 0 and hour + 24 < current:
+            days.append(hour // 24)
+            keys.append(day_key(hour // 24))
+            hour += 24
+        else:
+            keys.append(bucket_key(series, hour))
+            hour += 1
+    return keys, days
+
+
+class TrendingTracker:
+    """Top-N short codes by clicks over sliding windows, kept in Redis sorted sets.
+
+    The stats processor ZINCRBYs every code into a 5-minute and an hourly bucket
+    in the same pipeline as the other counters. Buckets are trimmed to their
+    ``max_bucket_size`` highest-scoring members, a heavy-hitter approximation
+    that bounds memory. A window query ZUNIONSTOREs its buckets into a result
+    cached for ``cache_ttl`` seconds and then reads it with ZREVRANGE, which costs
+    O(log N + n) rather than a keyspace scan. Only the worker holding a short
+    ``lock_ms`` lock recomputes an expired result; the others wait for it.
+    """
+
+    def __init__(self, cache_ttl: int = 10, max_bucket_size: int = 10000, lock_ms: int = 1000):
+        self.cache_ttl = cache_ttl
+        self.max_bucket_size = max_bucket_size
+        self.lock_ms = lock_ms
+
+    def record(self, pipe: Pipeline, minute_counts: Counter) -> None:
+        """Queue ZINCRBYs for ``{(short_code, epoch_minute): count}`` on ``pipe``."""
+        totals: Counter = Counter()
+        for (short_code, epoch_minute), count in minute_counts.items():
+            for series, (minutes, _) in BUCKETS.items():
+                totals[(series, epoch_minute // minutes, short_code)] += count
+
+        keys: dict[str, int] = {}
+        for (series, bucket, short_code), count in totals.items():
+            key = bucket_key(series, bucket)
+            pipe.zincrby(key, count, short_code)
+            minutes, retention = BUCKETS[series]
+            keys[key] = (bucket + 1) * minutes * 60 + retention
+        for key, expires_at in keys.items():
+            pipe.expireat(key, expires_at)
+            if self.max_bucket_size:
+                # Keep only the heaviest hitters of each bucket
+                pipe.zremrangebyrank(key, 0, -self.max_bucket_size - 1)
+
+    async def top(self, redis: Redis, window: TrendingWindow, n: int) -> list[dict]:
+        """The ``n`` short codes with the most clicks in ``window``, highest first."""
+        cache_key = f"url:trending:top:{window}"
+        if not await redis.exists(cache_key):
+            await self._refresh(redis, window, cache_key)
+        leaders = await redis.zrevrange(cache_key, 0, n - 1, withscores=True)
+        return [{"short_code": short_code, "clicks": int(score)} for short_code, score in leaders]
+
+    async def _refresh(self, redis: Redis, window: TrendingWindow, cache_key: str) -> None:
+        if not self.lock_ms:
+            await self._compute(redis, window, cache_key)
+            return
+        lock_key = f"{cache_key}:lock"
+        token = await acquire_lock(redis, lock_key, self.lock_ms)
+        if not token:
+            # Another worker is recomputing this window, give it a moment before doing it ourselves
+            if not await self._wait_for_result(redis, cache_key):
+                await self._compute(redis, window, cache_key)
+            return
+        try:
+            await self._compute(redis, window, cache_key)
+        finally:
+            await release_lock(redis, lock_key, token)
+
+    async def _compute(self, redis: Redis, window: TrendingWindow, cache_key: str) -> None:
+        series, count = WINDOWS[window]
+        minutes = BUCKETS[series][0]
+        current = int(datetime.now(UTC).timestamp()) // (minutes * 60)
+        keys, days = _window_buckets(series, current, count)
+        if days:
+            await self._roll_up_days(redis, days)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zunionstore(cache_key, keys)
+            pipe.expire(cache_key, self.cache_ttl)
+            await pipe.execute()
+
+    async def _roll_up_days(self, redis: Redis, days: list[int]) -> None:
+        """Create the missing daily rollups; a closed day's buckets no longer change."""
+        async with redis.pipeline(transaction=False) as pipe:
+            for day in days:
+                pipe.exists(day_key(day))
+            present = await pipe.execute()
+        missing = [day for day, exists in zip(days, present) if not exists]
+        if not missing:
+            return
+        async with redis.pipeline(transaction=False) as pipe:
+            for day in missing:
+                key = day_key(day)
+                pipe.zunionstore(key, [bucket_key("1h", day * 24 + hour) for hour in range(24)])
+                pipe.expireat(key, (day + 1) * 86400 + DAY_RETENTION)
+                if self.max_bucket_size:
+                    pipe.zremrangebyrank(key, 0, -self.max_bucket_size - 1)
+            await pipe.execute()
+
+    async def _wait_for_result(self, redis: Redis, cache_key: str, attempts: int = 10) -> bool:
+        """Poll for the cached result while another worker holds the recompute lock."""
+        for _ in range(attempts):
+            await asyncio.sleep(self.lock_ms / 1000 / attempts)
+            if await redis.exists(cache_key):
+                return True
+        return False
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, UTC
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.models import click_events
+
+logger = logging.getLogger(__name__)
+
+ClickRecord = tuple[datetime, str, Optional[str]]
+CLICK_EVENT_COLUMNS = [column.name for column in click_events.columns]
+
+
+def partition_name(day: date) -> str:
+    return f"{click_events.name}_{day:%Y%m%d}"
+
+
+class ClickArchive:
+    """Bulk loader of raw click events into the partitioned ``click_events`` table.
+
+    Each batch is sent with asyncpg's ``copy_records_to_table`` (binary COPY),
+    and PostgreSQL routes the rows to their day partitions.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.batches = 0
+        self.rows = 0
+
+    async def write(self, records: list[ClickRecord]) -> None:
+        """COPY ``(occurred_at, short_code, visitor_id)`` records in one round trip."""
+        if not records:
+            return
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                click_events.name, records=records, columns=CLICK_EVENT_COLUMNS
+            )
+        self.batches += 1
+        self.rows += len(records)
+
+    def metrics(self) -> dict:
+        return {"batches": self.batches, "rows": self.rows}
+
+
+class ClickPartitionManager:
+    """Creates ``click_events`` day partitions ahead of time and drops expired ones.
+
+    Retention is a DROP TABLE of whole partitions instead of a DELETE scan.
+    Rows outside every day partition land in ``click_events_default``; they are
+    moved into their day partition when it is created, and the few left over
+    are trimmed on the same retention schedule. Every CREATE and DROP runs in
+    its own transaction, so one failing step does not undo the others.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        days_ahead: int = 3,
+        retention_days: int = 90,
+        interval: float = 3600.0
+    ):
+        self.engine = engine
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def default_partition(self) -> str:
+        return f"{click_events.name}_default"
+
+    async def maintain(self) -> tuple[list[str], list[str]]:
+        """Create missing upcoming partitions and drop expired ones; returns (created, dropped)."""
+        today = datetime.now(UTC).date()
+        async with self.engine.begin() as conn:
+            existing = set(await self._partitions(conn))
+        if self.default_partition not in existing:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {self.default_partition} "
+                    f"PARTITION OF {click_events.name} DEFAULT"
+                ))
+
+        created = []
+        for offset in range(-1, self.days_ahead + 1):
+            day = today + timedelta(days=offset)
+            name = partition_name(day)
+            if name in existing:
+                continue
+            try:
+                await self._create_partition(day)
+                created.append(name)
+            except Exception as e:
+                logger.error(f"Error creating click event partition {name}: {str(e)}")
+
+        cutoff_day = today - timedelta(days=self.retention_days)
+        cutoff = partition_name(cutoff_day)
+        dropped = []
+        # Day partition names sort chronologically
+        for name in sorted(existing):
+            if name.removeprefix(f"{click_events.name}_").isdigit() and name < cutoff:
+                try:
+                    async with self.engine.begin() as conn:
+                        await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    dropped.append(name)
+                except Exception as e:
+                    logger.error(f"Error dropping click event partition {name}: {str(e)}")
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                f"DELETE FROM {self.default_partition} WHERE occurred_at < '{cutoff_day.isoformat()}'"
+            ))
+
+        if created or dropped:
+            logger.info(f"Click event partitions created: {created}, dropped: {dropped}")
+        return created, dropped
+
+    async def _create_partition(self, day: date) -> None:
+        """Create the partition of ``day``, taking over its rows from the default partition.
+
+        PostgreSQL refuses to add a partition while the default partition holds
+        rows of its range, so the table is created standalone, filled with
+        those rows and attached, all in one transaction.
+        """
+        name = partition_name(day)
+        start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} (LIKE {click_events.name} INCLUDING DEFAULTS)"
+            ))
+            await conn.execute(text(
+                f"WITH moved AS (DELETE FROM {self.default_partition} "
+                f"WHERE occurred_at >= '{start}' AND occurred_at < '{end}' RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ))
+            await conn.execute(text(
+                f"ALTER TABLE {click_events.name} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+
+    async def _partitions(self, conn) -> list[str]:
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ), {"table": click_events.name})
+        return list(result.scalars())
+
+    async def start(self) -> None:
+        """Make sure today's partitions exist, then keep maintaining them in the background."""
+        try:
+            await self.maintain()
+        except Exception as e:
+            # Another worker may be creating the same partitions; the loop retries
+            logger.error(f"Error maintaining click event partitions: {str(e)}")
+        self._task = asyncio.create_task(self._maintain_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _maintain_loop(self) -> None:
+        """Background task that keeps partitions created ahead and within retention."""
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error maintaining click event partitions: {str(e)}")
@@ -1,11 +1,36 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, Sequence, String, Table, text
 from sqlalchemy.sql import func
 from .session import Base
 
+# IDs for BlockSequenceGenerator are leased ID_BLOCK_SIZE at a time. They start
+# at ID_OFFSET so their codes never match the values HashBasedGenerator encodes
+# (hash % 10**8) with the same salt. The Redis allocator leases from
+# REDIS_ID_OFFSET instead, a range the PostgreSQL sequence would need 10**9
+# leases to reach, so switching SHORT_CODE_ID_ALLOCATOR never reissues a code.
+ID_BLOCK_SIZE = 1000
+ID_OFFSET = 10**8
+REDIS_ID_OFFSET = 10**12
+short_code_id_seq = Sequence(
+    "short_code_id_seq", start=ID_OFFSET, increment=ID_BLOCK_SIZE, metadata=Base.metadata
+)
+
 class ShortUrl(Base):
     """Represents a shortened URL entry in the database."""
 
     __tablename__ = "short_urls"
+    __table_args__ = (
+        # get_by_original_url is an equality lookup on an arbitrarily long URL;
+        # a hash index stays small and does not depend on the URL length
+        Index("ix_short_urls_original_url_hash", "original_url", postgresql_using="hash"),
+        # Redirect lookup on active rows: filters on (short_code, expires_at) and
+        # reads original_url straight from the index (index-only scan)
+        Index(
+            "ix_short_urls_active_short_code",
+            "short_code", "expires_at",
+            postgresql_include=["original_url"],
+            postgresql_where=text("is_active IS NOT false")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, doc="Unique identifier for the short URL")
     original_url = Column(String, nullable=False, doc="The original, long URL")
@@ -14,3 +39,30 @@ class ShortUrl(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False, doc="Timestamp when the short URL expires")
     is_active = Column(Boolean, default=True, doc="Indicates if the short URL is active")
     click_count = Column(Integer, default=0, doc="Number of times the short URL has been clicked")
+
+
+class ClickFlushCheckpoint(Base):
+    """A click_count flush batch that has been applied to ``short_urls``.
+
+    Inserted in the same transaction as the batch's UPDATE, so a batch retried
+    after a crash is recognised and not applied twice.
+    """
+
+    __tablename__ = "click_flush_checkpoints"
+
+    batch_id = Column(String, primary_key=True, doc="Identifier of the flushed Redis batch")
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), index=True, doc="Timestamp of the flush")
+
+
+# Append-only archive of raw click events, range-partitioned by day. Partitions
+# are created ahead of time and dropped after retention by ClickPartitionManager;
+# a partitioned table has no primary key unless it includes occurred_at.
+click_events = Table(
+    "click_events",
+    Base.metadata,
+    Column("occurred_at", DateTime(timezone=True), nullable=False),
+    Column("short_code", String, nullable=False),
+    Column("visitor_id", String, nullable=True),
+    Index("ix_click_events_short_code_occurred_at", "short_code", "occurred_at"),
+    postgresql_partition_by="RANGE (occurred_at)",
+)
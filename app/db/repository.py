@@ -1,32 +1,63 @@
 from datetime import datetime, timedelta, UTC
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy import Select, String, any_, bindparam, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from typing import Optional
 
+from app.cache.invalidation import CacheInvalidator
 from .models import ShortUrl
 
+# Each inserted row binds 5 parameters (including the is_active and click_count
+# defaults); 6000 rows stay below asyncpg's limit of 32767 per statement
+CREATE_MANY_CHUNK_SIZE = 6000
+
+
+def _existing_short_codes_query(short_codes: list[str], active_only: bool) -> Select:
+    query = select(ShortUrl.short_code).where(
+        ShortUrl.short_code == any_(bindparam("short_codes", short_codes, type_=ARRAY(String)))
+    )
+    if active_only:
+        query = query.where(ShortUrl.expires_at > datetime.now(UTC), ShortUrl.is_active.is_not(False))
+    return query
+
 
 class ShortUrlRepository:
-    def __init__(self, db_session: AsyncSession):
+    def __init__(self, db_session: AsyncSession, invalidator: Optional[CacheInvalidator] = None):
         self.db_session = db_session
+        self.invalidator = invalidator
 
     async def get_by_original_url(self, original_url: str) -> Optional[ShortUrl]:
         """Get an active short URL by its original URL."""
         now = datetime.now(UTC)
-        query = select(ShortUrl).where(
+        # Lambda statements are built and compiled once; later calls only bind new parameters
+        query = lambda_stmt(lambda: select(ShortUrl).where(
             ShortUrl.original_url == original_url,
-            ShortUrl.expires_at > now
-        )
+            ShortUrl.expires_at > now,
+            ShortUrl.is_active.is_not(False)
+        ))
         result = await self.db_session.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_many_by_original_urls(self, original_urls: list[str]) -> dict[str, ShortUrl]:
+        """Get active short URLs for many original URLs with one ``= ANY(:urls)`` query."""
+        now = datetime.now(UTC)
+        query = select(ShortUrl).where(
+            ShortUrl.original_url == any_(bindparam("original_urls", original_urls, type_=ARRAY(String))),
+            ShortUrl.expires_at > now,
+            ShortUrl.is_active.is_not(False)
+        )
+        result = await self.db_session.execute(query)
+        return {short_url.original_url: short_url for short_url in result.scalars()}
+
     async def get_by_short_code(self, short_code: str) -> Optional[ShortUrl]:
         """Get an active short URL by its short code."""
         now = datetime.now(UTC)
-        query = select(ShortUrl).where(
+        query = lambda_stmt(lambda: select(ShortUrl).where(
             ShortUrl.short_code == short_code,
-            ShortUrl.expires_at > now
-        )
+            ShortUrl.expires_at > now,
+            ShortUrl.is_active.is_not(False)
+        ))
         result = await self.db_session.execute(query)
         return result.scalar_one_or_none()
 
@@ -41,8 +72,63 @@ class ShortUrlRepository:
         self.db_session.add(short_url)
         await self.db_session.commit()
         await self.db_session.refresh(short_url)
+        # Clear any negative lookup cached for this code before it existed
+        await self._invalidate(short_code)
         return short_url
 
+    async def create_many(self, items: list[tuple[str, str]], expires_days: int = 30) -> list[Row]:
+        """Insert (original_url, short_code) pairs with INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+        One statement per CREATE_MANY_CHUNK_SIZE rows, all committed together.
+        Rows whose short code already exists are skipped and missing from the result.
+        """
+        if not items:
+            return []
+        expires_at = datetime.now(UTC) + timedelta(days=expires_days)
+        rows = []
+        for i in range(0, len(items), CREATE_MANY_CHUNK_SIZE):
+            query = (
+                pg_insert(ShortUrl)
+                .values([
+                    {"original_url": original_url, "short_code": short_code, "expires_at": expires_at}
+                    for original_url, short_code in items[i:i + CREATE_MANY_CHUNK_SIZE]
+                ])
+                .on_conflict_do_nothing(index_elements=[ShortUrl.short_code])
+                .returning(ShortUrl.original_url, ShortUrl.short_code, ShortUrl.created_at)
+            )
+            result = await self.db_session.execute(query)
+            rows.extend(result.all())
+        await self.db_session.commit()
+        if self.invalidator:
+            await self.invalidator.publish_many([row.short_code for row in rows])
+        return rows
+
+    async def existing_short_codes(self, short_codes: list[str], active_only: bool = True) -> set[str]:
+        """Return which of the given short codes are active, with one ``= ANY(:codes)`` query.
+
+        ``active_only=False`` also returns expired and deactivated codes, which
+        still hold their slot in the unique index.
+        """
+        if not short_codes:
+            return set()
+        query = _existing_short_codes_query(short_codes, active_only)
+        result = await self.db_session.execute(query)
+        return set(result.scalars())
+
+    async def deactivate(self, short_code: str) -> bool:
+        """Deactivate a short URL and evict it from every cache layer."""
+        result = await self.db_session.execute(
+            update(ShortUrl).where(ShortUrl.short_code == short_code).values(is_active=False)
+        )
+        await self.db_session.commit()
+        # After the commit, so no worker can refill a cache from the old row
+        await self._invalidate(short_code)
+        return result.rowcount > 0
+
+    async def _invalidate(self, short_code: str) -> None:
+        if self.invalidator:
+            await self.invalidator.publish(short_code)
+
     async def increment_click_count(self, short_code: str, count: int = 1):
         """Increment the click count for a short URL."""
         query = select(ShortUrl).where(ShortUrl.short_code == short_code)
@@ -50,4 +136,39 @@ class ShortUrlRepository:
         short_url_obj = result.scalar_one_or_none()
         if short_url_obj:
             short_url_obj.click_count += count
-            await self.db_session.commit() 
\ No newline at end of file
+            await self.db_session.commit() 
+
+class ShortUrlReader:
+    """Read-only lookups for the redirect path.
+
+    Selects only the columns the redirect needs on a plain Core connection, so
+    there is no ORM instance, identity map or unit of work involved.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+
+    async def get_mapping(self, short_code: str) -> Optional[Row]:
+        """Get (original_url, expires_at) of an active short URL by its short code."""
+        now = datetime.now(UTC)
+        query = lambda_stmt(lambda: select(ShortUrl.original_url, ShortUrl.expires_at).where(
+            ShortUrl.short_code == short_code,
+            ShortUrl.expires_at > now,
+            ShortUrl.is_active.is_not(False)
+        ))
+        async with self.engine.connect() as conn:
+            result = await conn.execute(query)
+            return result.first()
+
+    async def existing_short_codes(self, short_codes: list[str], active_only: bool = True) -> set[str]:
+        """Return which of the given short codes are active, with one ``= ANY(:codes)`` query.
+
+        ``active_only=False`` also returns expired and deactivated codes, which
+        still hold their slot in the unique index.
+        """
+        if not short_codes:
+            return set()
+        query = _existing_short_codes_query(short_codes, active_only)
+        async with self.engine.connect() as conn:
+            result = await conn.execute(query)
+            return set(result.scalars())
@@ -5,6 +5,7 @@ from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.view.home import router as web_router
 from app.router.api.url_router import router as api_router
+from app.router.api.metrics_router import router as metrics_router
 from app.core.lifespan import lifespan
 from app.core.error_handlers import register_error_handlers
 from app.router.redirect_router import router as redirect_router
@@ -24,6 +25,7 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Include routers
 app.include_router(web_router)
 app.include_router(api_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
 app.include_router(redirect_router)
 
 # Register error handlers
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from app.core.container import ServiceContainer
+from app.core.di import get_container
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(
+    container: ServiceContainer = Depends(get_container)
+) -> dict:
+    """Expose runtime metrics such as the click queue backlog."""
+    return await container.metrics()
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import RedirectResponse
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from app.core.di import get_url_controller
-from app.schemas.url import URLCreate, URLResponse
+from app.schemas.url import StatsBatchRequest, URLBulkCreate, URLCreate, URLResponse
 from app.controllers.url import URLController
+from app.core.rollups import Granularity
+from app.core.trending import TrendingWindow
 
 router = APIRouter()
 
@@ -16,19 +20,62 @@ async def create_short_url(
     return await controller.create_short_url(url_data)
 
 
+@router.post("/shorten/bulk", response_class=StreamingResponse)
+async def create_short_urls_bulk(
+    url_data: URLBulkCreate,
+    controller: URLController = Depends(get_url_controller)
+) -> StreamingResponse:
+    """Create short URLs for many URLs, answering with one NDJSON line per distinct URL (sent once all are done)."""
+    return await controller.create_short_urls_bulk(url_data)
+
+
 @router.get("/resolve/{short_code}")
 async def resolve_short_url(
     short_code: str,
+    request: Request,
     controller: URLController = Depends(get_url_controller)
 ) -> dict:
     """Resolves a short code to its original URL and logs click event."""
-    return await controller.resolve_short_url(short_code)
+    return await controller.resolve_short_url(short_code, request)
+
+
+@router.post("/admin/urls/{short_code}/deactivate")
+async def deactivate_short_url(
+    short_code: str,
+    x_admin_key: Optional[str] = Header(None),
+    controller: URLController = Depends(get_url_controller)
+) -> dict:
+    """Deactivate a short URL and invalidate it in every worker's caches."""
+    return await controller.deactivate_short_url(short_code, x_admin_key)
+
+
+@router.post("/stats/batch")
+async def get_url_stats_batch(
+    stats_request: StatsBatchRequest,
+    controller: URLController = Depends(get_url_controller)
+) -> dict:
+    """Get statistics for many short URLs over a date range in one response."""
+    return await controller.get_url_stats_batch(stats_request)
+
+
+# Declared before /stats/{short_code} so "top" is not taken as a short code
+@router.get("/stats/top")
+async def get_top_urls(
+    window: TrendingWindow = "1h",
+    n: int = Query(100, ge=1, le=1000),
+    controller: URLController = Depends(get_url_controller)
+) -> dict:
+    """Get the most clicked short URLs within a time window."""
+    return await controller.get_top_urls(window, n)
 
 
 @router.get("/stats/{short_code}")
 async def get_url_stats(
     short_code: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: Optional[Granularity] = None,
     controller: URLController = Depends(get_url_controller)
 ) -> dict:
-    """Get statistics for a short URL."""
-    return await controller.get_url_stats(short_code) 
\ No newline at end of file
+    """Get statistics for a short URL; ``from``/``to``/``granularity`` select a bucketed range."""
+    return await controller.get_url_stats(short_code, start, end, granularity) 
\ No newline at end of file
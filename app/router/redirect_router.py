@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
 from app.controllers.url import URLController
 from app.core.di import get_url_controller
@@ -8,7 +8,8 @@ router = APIRouter()
 @router.get("/{short_code}")
 async def redirect_to_url(
     short_code: str,
+    request: Request,
     controller: URLController = Depends(get_url_controller)
 ) -> RedirectResponse:
     """Redirect to the original URL for the given short code."""
-    return await controller.redirect_to_url(short_code)
\ No newline at end of file
+    return await controller.redirect_to_url(short_code, request)
\ No newline at end of file
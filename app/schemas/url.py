@@ -1,11 +1,37 @@
-from datetime import datetime
-from pydantic import BaseModel, HttpUrl
-from pydantic import ConfigDict
+from datetime import date, datetime, timedelta, UTC
+from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl
+from pydantic import ConfigDict, model_validator
+
+# Longest date range a batch stats request may cover
+STATS_BATCH_MAX_DAYS = 92
 
 class URLCreate(BaseModel):
     """Schema for creating a new short URL."""
     original_url: HttpUrl
 
+class URLBulkCreate(BaseModel):
+    """Schema for shortening many URLs in one request."""
+    # Bounds the work and memory of one request; the INSERT itself is chunked by the repository
+    original_urls: list[HttpUrl] = Field(..., min_length=1, max_length=10000)
+
+class StatsBatchRequest(BaseModel):
+    """Schema for reading stats of many short codes over a date range."""
+    short_codes: list[str] = Field(..., min_length=1, max_length=1000)
+    # Defaults to the last 7 days, like the single-code endpoint
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        self.end_date = self.end_date or datetime.now(UTC).date()
+        self.start_date = self.start_date or self.end_date - timedelta(days=6)
+        if self.start_date > self.end_date:
+            raise ValueError("start_date must not be after end_date")
+        if (self.end_date - self.start_date).days >= STATS_BATCH_MAX_DAYS:
+            raise ValueError(f"Date range must not exceed {STATS_BATCH_MAX_DAYS} days")
+        return self
+
 class URLResponse(BaseModel):
     """Schema for URL response."""
     short_code: str
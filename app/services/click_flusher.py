@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from sqlalchemy import Integer, String, column, delete, func, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.stats_queue import CLICKS_PENDING_KEY as PENDING_KEY
+from app.db.models import ClickFlushCheckpoint, ShortUrl
+
+logger = logging.getLogger(__name__)
+
+# The batch currently being written to Postgres
+FLUSHING_KEY = "url:clicks:flushing"
+BATCH_FIELD = "_batch"
+# Two bind parameters per row keeps each UPDATE well below PostgreSQL's limit
+FLUSH_CHUNK_SIZE = 10000
+CHECKPOINT_RETENTION = timedelta(days=7)
+
+
+class ClickCountFlusher:
+    """Write-behind of ``ShortUrl.click_count`` from Redis counters.
+
+    The stats processor HINCRBYs per-code deltas into ``url:clicks:pending``.
+    Every ``interval`` seconds that hash is renamed to ``url:clicks:flushing``
+    and tagged with a batch id, then applied with set-based
+    ``UPDATE ... FROM (VALUES ...)`` statements. The batch id is inserted into
+    ``click_flush_checkpoints`` in the same transaction, so if the process dies
+    after the commit but before the flushing hash is deleted, the retried batch
+    is recognised and skipped instead of being applied twice.
+    """
+
+    def __init__(self, redis: Redis, engine: AsyncEngine, interval: float = 60.0):
+        self.redis = redis
+        self.engine = engine
+        self.interval = interval
+        self.lock_key = f"{FLUSHING_KEY}:lock"
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.skipped_batches = 0
+        self.codes_flushed = 0
+        self.clicks_flushed = 0
+
+    async def flush(self) -> int:
+        """Apply one batch of pending deltas; returns the number of clicks written."""
+        # Only one worker flushes at a time, so nobody renames over a batch in progress
+        if not await self.redis.set(self.lock_key, "1", nx=True, ex=max(int(self.interval * 10), 60)):
+            return 0
+        try:
+            try:
+                # Does nothing if a batch from an interrupted flush is still waiting
+                await self.redis.renamenx(PENDING_KEY, FLUSHING_KEY)
+            except ResponseError:
+                pass  # Nothing pending
+            await self.redis.hsetnx(FLUSHING_KEY, BATCH_FIELD, uuid.uuid4().hex)
+            batch = await self.redis.hgetall(FLUSHING_KEY)
+            batch_id = batch.pop(BATCH_FIELD, None)
+            deltas = [(code, int(delta)) for code, delta in batch.items() if int(delta)]
+            if batch_id is None or not deltas:
+                await self.redis.delete(FLUSHING_KEY)
+                return 0
+
+            applied = await self._apply(batch_id, deltas)
+            await self.redis.delete(FLUSHING_KEY)
+        finally:
+            await self.redis.delete(self.lock_key)
+
+        if not applied:
+            self.skipped_batches += 1
+            logger.warning(f"Click batch {batch_id} was already applied, skipping")
+            return 0
+        clicks = sum(delta for _, delta in deltas)
+        self.batches += 1
+        self.codes_flushed += len(deltas)
+        self.clicks_flushed += clicks
+        logger.info(f"Flushed {clicks} clicks for {len(deltas)} short codes")
+        return clicks
+
+    async def _apply(self, batch_id: str, deltas: list[tuple[str, int]]) -> bool:
+        """Checkpoint and apply a batch in one transaction; False if it was applied before."""
+        async with self.engine.begin() as conn:
+            checkpoint = await conn.execute(
+                pg_insert(ClickFlushCheckpoint)
+                .values(batch_id=batch_id)
+                .on_conflict_do_nothing(index_elements=[ClickFlushCheckpoint.batch_id])
+                .returning(ClickFlushCheckpoint.batch_id)
+            )
+            if checkpoint.first() is None:
+                return False
+
+            for i in range(0, len(deltas), FLUSH_CHUNK_SIZE):
+                batch = values(
+                    column("short_code", String), column("delta", Integer), name="deltas"
+                ).data(deltas[i:i + FLUSH_CHUNK_SIZE])
+                await conn.execute(
+                    update(ShortUrl)
+                    .where(ShortUrl.short_code == batch.c.short_code)
+                    .values(click_count=func.coalesce(ShortUrl.click_count, 0) + batch.c.delta)
+                )
+
+            await conn.execute(
+                delete(ClickFlushCheckpoint)
+                .where(ClickFlushCheckpoint.applied_at < func.now() - CHECKPOINT_RETENTION)
+            )
+        return True
+
+    async def start(self) -> None:
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+    async def _flush_loop(self) -> None:
+        """Background task that flushes pending deltas every interval."""
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error flushing click counts: {str(e)}")
+
+    async def metrics(self) -> dict:
+        return {
+            "pending_codes": await self.redis.hlen(PENDING_KEY),
+            "batches": self.batches,
+            "skipped_batches": self.skipped_batches,
+            "codes_flushed": self.codes_flushed,
+            "clicks_flushed": self.clicks_flushed,
+        }
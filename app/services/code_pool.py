@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import secrets
+import time
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.cache.locks import acquire_lock, release_lock
+from app.db.repository import ShortUrlReader
+
+logger = logging.getLogger(__name__)
+
+
+class CodePool:
+    """Redis set of pre-generated random short codes that are known to be unused.
+
+    A background task tops the set up to ``target_size`` whenever it drops below
+    ``low_water``; candidates already present in ``short_urls`` are discarded
+    before they are added. A lock lets only one worker refill at a time, so the
+    pool is not overfilled once per worker. The create path takes a code with
+    one SPOP.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        reader: ShortUrlReader,
+        target_size: int,
+        low_water: int,
+        refill_interval: float = 1.0,
+        key: str = "short_code:pool",
+        code_bytes: int = 6,
+        lock_ms: int = 30000
+    ):
+        self.redis = redis
+        self.reader = reader
+        self.target_size = target_size
+        self.low_water = low_water
+        self.refill_interval = refill_interval
+        self.key = key
+        self.code_bytes = code_bytes
+        self.lock_key = f"{key}:lock"
+        self.lock_ms = lock_ms
+        self._refill_task: Optional[asyncio.Task] = None
+        self.refills = 0
+        self.codes_added = 0
+        self.misses = 0
+        self.last_refill_rate = 0.0
+
+    async def pop(self) -> Optional[str]:
+        """Take a reserved code, or None when the pool is empty."""
+        code = await self.redis.spop(self.key)
+        if code is None:
+            self.misses += 1
+        return code
+
+    async def refill(self) -> int:
+        """Top the pool up to target_size if it is below the low-water mark."""
+        # Another worker is refilling; topping up concurrently would overfill the pool
+        lock_token = await acquire_lock(self.redis, self.lock_key, self.lock_ms)
+        if not lock_token:
+            return 0
+        try:
+            depth = await self.redis.scard(self.key)
+            if depth >= self.low_water:
+                return 0
+
+            start = time.perf_counter()
+            candidates = {secrets.token_urlsafe(self.code_bytes) for _ in range(self.target_size - depth)}
+            # Expired and deactivated codes still hold their slot in the unique index
+            taken = await self.reader.existing_short_codes(list(candidates), active_only=False)
+            fresh = list(candidates - taken)
+            added = await self.redis.sadd(self.key, *fresh) if fresh else 0
+        finally:
+            # A refill that outlived lock_ms must not release the next holder's lock
+            await release_lock(self.redis, self.lock_key, lock_token)
+
+        elapsed = time.perf_counter() - start
+        self.refills += 1
+        self.codes_added += added
+        self.last_refill_rate = added / elapsed if elapsed else 0.0
+        logger.info(f"Refilled short code pool with {added} codes ({depth} -> {depth + added})")
+        return added
+
+    async def start(self) -> None:
+        self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+
+    async def _refill_loop(self) -> None:
+        """Background task that keeps the pool above its low-water mark."""
+        while True:
+            try:
+                await self.refill()
+                await asyncio.sleep(self.refill_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refilling short code pool: {str(e)}")
+                await asyncio.sleep(5)
+
+    async def metrics(self) -> dict:
+        return {
+            "depth": await self.redis.scard(self.key),
+            "low_water": self.low_water,
+            "target_size": self.target_size,
+            "refills": self.refills,
+            "codes_added": self.codes_added,
+            "last_refill_rate": round(self.last_refill_rate, 1),
+            "misses": self.misses,
+        }
@@ -1,7 +1,15 @@
-from typing import Protocol
+import asyncio
+import hashlib
+from typing import Iterator, Optional, Protocol
 import secrets
 import os
 from hashids import Hashids
+from redis.asyncio import Redis
+from sqlalchemy import Sequence, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.models import REDIS_ID_OFFSET, short_code_id_seq
+from app.services.code_pool import CodePool
 
 
 class ShortCodeGenerator(Protocol):
@@ -15,12 +23,14 @@ class ShortCodeGenerator(Protocol):
 class HashBasedGenerator:
     """Generates short codes based on a hash of the original URL."""
 
+    def __init__(self, salt: Optional[str] = None):
+        self.hashids = Hashids(salt=salt or os.getenv("SECRET_KEY", "your-secret-key-here"), min_length=6)
+
     async def generate(self, original_url: str) -> str:
         """Generates a short code using Hashids based on URL hash."""
-        salt = os.getenv("SECRET_KEY", "your-secret-key-here")
-        hashids = Hashids(salt=salt, min_length=6)
-        # Using abs(hash()) to ensure a positive integer for encoding
-        return hashids.encode(abs(hash(original_url)) % (10**8))
+        # blake2b is stable across processes, unlike the randomized built-in hash()
+        digest = hashlib.blake2b(original_url.encode(), digest_size=8).digest()
+        return self.hashids.encode(int.from_bytes(digest, "big") % (10**8))
 
 
 class RandomGenerator:
@@ -28,4 +38,93 @@ class RandomGenerator:
 
     async def generate(self, original_url: str) -> str:
         """Generates a random URL-safe short code."""
-        return secrets.token_urlsafe(6) 
\ No newline at end of file
+        return secrets.token_urlsafe(6)
+
+
+class PooledRandomGenerator:
+    """Takes pre-verified random codes from a CodePool, generating one directly if it runs dry.
+
+    Fallback codes are checked against ``short_urls`` like pooled ones. The check
+    cannot see a concurrent insert of the same code; that rare collision is left
+    to the unique constraint on ``short_code`` (``create`` raises, ``create_many``
+    skips the row through ON CONFLICT DO NOTHING).
+    """
+
+    def __init__(self, pool: CodePool, fallback: Optional[ShortCodeGenerator] = None, fallback_candidates: int = 3):
+        self.pool = pool
+        self.fallback = fallback or RandomGenerator()
+        self.fallback_candidates = fallback_candidates
+
+    async def generate(self, original_url: str) -> str:
+        """Pops a reserved code in O(1)."""
+        code = await self.pool.pop()
+        if code is not None:
+            return code
+        # Check a few candidates in one query rather than one round trip per retry
+        candidates = [await self.fallback.generate(original_url) for _ in range(self.fallback_candidates)]
+        taken = await self.pool.reader.existing_short_codes(candidates, active_only=False)
+        for candidate in candidates:
+            if candidate not in taken:
+                return candidate
+        raise RuntimeError("No unused short code among the fallback candidates")
+
+
+class IdBlockAllocator(Protocol):
+    """Protocol for leasing ranges of unique integer IDs."""
+
+    async def lease(self) -> range:
+        """Reserve the next block of IDs for this process."""
+        ...
+
+
+class PostgresSequenceAllocator:
+    """Leases ID blocks from a PostgreSQL sequence whose INCREMENT is the block size."""
+
+    def __init__(self, engine: AsyncEngine, sequence: Sequence = short_code_id_seq):
+        self.engine = engine
+        self.sequence = sequence
+
+    async def lease(self) -> range:
+        async with self.engine.connect() as conn:
+            start = await conn.scalar(select(self.sequence.next_value()))
+        return range(start, start + self.sequence.increment)
+
+
+class RedisBlockAllocator:
+    """Leases ID blocks with INCRBY on a Redis counter, in a range disjoint from the PostgreSQL sequence."""
+
+    def __init__(self, redis: Redis, block_size: int, key: str = "short_code:id_seq", offset: int = REDIS_ID_OFFSET):
+        self.redis = redis
+        self.block_size = block_size
+        self.key = key
+        self.offset = offset
+
+    async def lease(self) -> range:
+        end = await self.redis.incrby(self.key, self.block_size)
+        return range(self.offset + end - self.block_size, self.offset + end)
+
+
+class BlockSequenceGenerator:
+    """Generates collision-free short codes by encoding IDs leased in blocks.
+
+    Only one allocator round trip is made per block; every other call encodes
+    the next ID locally. Since every process leases disjoint blocks, codes are
+    unique across workers.
+    """
+
+    def __init__(self, allocator: IdBlockAllocator, salt: str, min_length: int = 6):
+        self.allocator = allocator
+        self.hashids = Hashids(salt=salt, min_length=min_length)
+        self._ids: Iterator[int] = iter(())
+        self._lock = asyncio.Lock()
+
+    async def generate(self, original_url: str) -> str:
+        """Encodes the next leased ID, leasing a new block when the current one is used up."""
+        short_id = next(self._ids, None)
+        if short_id is None:
+            async with self._lock:
+                short_id = next(self._ids, None)
+                if short_id is None:
+                    self._ids = iter(await self.allocator.lease())
+                    short_id = next(self._ids)
+        return self.hashids.encode(short_id)
@@ -0,0 +1,398 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import re
+import socket
+import time
+from array import array
+from bisect import bisect_left
+from typing import Optional
+from urllib.parse import unquote_to_bytes
+
+import aiohttp
+from fastapi import HTTPException
+
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+THREAT_TYPES = ["MALWARE", "SOCIAL_ENGINEERING", "UNWANTED_SOFTWARE", "POTENTIALLY_HARMFUL_APPLICATION"]
+PLATFORM_TYPE = "ANY_PLATFORM"
+THREAT_ENTRY_TYPE = "URL"
+CLIENT = {"clientId": "slink", "clientVersion": "1.0.0"}
+
+
+# --- URL canonicalization and expressions (Safe Browsing v4 "URLs and Hashing") ---
+
+def canonicalize_url(url: str) -> str:
+    """Canonicalize a URL the way Safe Browsing does before hashing it."""
+    raw = re.sub(rb"[\t\r\n]", b"", url.strip().encode("utf-8"))
+    raw = raw.split(b"#", 1)[0]
+    # Repeatedly percent-unescape until nothing changes
+    while True:
+        unescaped = unquote_to_bytes(raw)
+        if unescaped == raw:
+            break
+        raw = unescaped
+    # Work on a latin-1 view so every byte maps to exactly one character
+    text = raw.decode("latin-1")
+    if "://" not in text:
+        text = "http://" + text
+    scheme, rest = text.split("://", 1)
+
+    host_end = next((i for i, c in enumerate(rest) if c in "/?"), len(rest))
+    host, path_query = rest[:host_end], rest[host_end:]
+    host = host.rpartition("@")[2].split(":")[0]
+    path, sep, query = path_query.partition("?")
+
+    canonical = f"{scheme.lower()}://{_canonical_host(host)}{_canonical_path(path)}"
+    if sep:
+        canonical += "?" + query
+    return _escape(canonical)
+
+
+def _canonical_host(host: str) -> str:
+    host = re.sub(r"\.{2,}", ".", host.lower().strip("."))
+    return _parse_ipv4(host) or host
+
+
+def _parse_ipv4(host: str) -> Optional[str]:
+    """Normalize decimal, octal, hex and shortened IPv4 forms to a dotted quad."""
+    parts = host.split(".")
+    if not 1 <= len(parts) <= 4:
+        return None
+    values = []
+    for part in parts:
+        try:
+            if part.lower().startswith("0x"):
+                values.append(int(part[2:] or "0", 16))
+            elif len(part) > 1 and part.startswith("0"):
+                values.append(int(part, 8))
+            else:
+                values.append(int(part, 10))
+        except ValueError:
+            return None
+    *head, last = values
+    # The last component fills all remaining bytes
+    if any(v > 255 for v in head) or last >= 256 ** (5 - len(values)):
+        return None
+    number = 0
+    for value in head:
+        number = number * 256 + value
+    number = number * 256 ** (5 - len(values)) + last
+    return socket.inet_ntoa(number.to_bytes(4, "big"))
+
+
+def _canonical_path(path: str) -> str:
+    """Resolve ``.``/``..`` segments and collapse repeated slashes."""
+    if not path:
+        return "/"
+    trailing = path.endswith(("/", "/.", "/.."))
+    segments: list[str] = []
+    for segment in path.split("/"):
+        if segment in ("", "."):
+            continue
+        if segment == "..":
+            if segments:
+                segments.pop()
+            continue
+        segments.append(segment)
+    canonical = "/" + "/".join(segments)
+    if trailing and segments:
+        canonical += "/"
+    return canonical
+
+
+def _escape(text: str) -> str:
+    """Percent-escape control characters, non-ASCII bytes, '#' and '%'."""
+    return "".join(
+        f"%{ord(c):02X}" if ord(c) <= 0x20 or ord(c) >= 0x7F or c in "#%" else c
+        for c in text
+    )
+
+
+def url_expressions(canonical_url: str) -> list[str]:
+    """Host-suffix / path-prefix expressions of a canonical URL, in lookup order."""
+    rest = canonical_url.split("://", 1)[1]
+    host_end = rest.find("/")
+    host, path_query = rest[:host_end], rest[host_end:]
+    path, sep, query = path_query.partition("?")
+
+    hosts = [host]
+    if not _parse_ipv4(host):
+        components = host.split(".")
+        # Up to 4 more hosts from the last five components, never the bare TLD
+        for i in range(max(1, len(components) - 5), len(components) - 1):
+            hosts.append(".".join(components[i:]))
+
+    paths = [path + "?" + query] if sep else []
+    paths.append(path)
+    prefix = "/"
+    paths.append(prefix)
+    for segment in path.split("/")[1:-1][:3]:
+        prefix += segment + "/"
+        paths.append(prefix)
+
+    return list(dict.fromkeys(h + p for h in hosts for p in paths))
+
+
+def url_hashes(url: str) -> list[bytes]:
+    """SHA256 full hashes of every expression of a URL."""
+    return [hashlib.sha256(expr.encode("latin-1")).digest() for expr in url_expressions(canonicalize_url(url))]
+
+
+# --- Local prefix database ---
+
+class PrefixSet:
+    """Compact, read-only lookup structure over hash prefixes.
+
+    4-byte prefixes (nearly all of them) live in a sorted ``array`` of 32-bit
+    integers; longer prefixes are kept in sorted lists per length. Membership
+    is a binary search per prefix length.
+    """
+
+    def __init__(self, prefixes: list[bytes]):
+        four = sorted(int.from_bytes(p, "big") for p in prefixes if len(p) == 4)
+        self._four = array("I", four) if array("I").itemsize == 4 else array("L", four)
+        self._longer: dict[int, list[bytes]] = {}
+        for p in prefixes:
+            if len(p) != 4:
+                self._longer.setdefault(len(p), []).append(p)
+        for values in self._longer.values():
+            values.sort()
+
+    def __len__(self) -> int:
+        return len(self._four) + sum(len(v) for v in self._longer.values())
+
+    def match(self, full_hash: bytes) -> Optional[bytes]:
+        """Return the stored prefix of ``full_hash``, if any."""
+        value = int.from_bytes(full_hash[:4], "big")
+        i = bisect_left(self._four, value)
+        if i < len(self._four) and self._four[i] == value:
+            return full_hash[:4]
+        for length, values in self._longer.items():
+            prefix = full_hash[:length]
+            i = bisect_left(values, prefix)
+            if i < len(values) and values[i] == prefix:
+                return prefix
+        return None
+
+
+class ThreatList:
+    """Client-side copy of one Safe Browsing threat list."""
+
+    def __init__(self, threat_type: str):
+        self.threat_type = threat_type
+        self.state = ""
+        # Sorted lexicographically, as removal indices and the checksum require
+        self.prefixes: list[bytes] = []
+
+    def reset(self) -> None:
+        self.state = ""
+        self.prefixes = []
+
+    def apply(self, update: dict) -> bool:
+        """Apply a FULL_UPDATE or PARTIAL_UPDATE response; False if the checksum does not match."""
+        if update.get("responseType") == "FULL_UPDATE":
+            self.prefixes = []
+        for removal in update.get("removals", []):
+            indices = set(removal.get("rawIndices", {}).get("indices", []))
+            self.prefixes = [p for i, p in enumerate(self.prefixes) if i not in indices]
+        for addition in update.get("additions", []):
+            raw_hashes = addition.get("rawHashes", {})
+            size = raw_hashes.get("prefixSize", 4)
+            data = base64.b64decode(raw_hashes.get("rawHashes", ""))
+            self.prefixes.extend(data[i:i + size] for i in range(0, len(data), size))
+        self.prefixes.sort()
+
+        expected = update.get("checksum", {}).get("sha256")
+        if expected and hashlib.sha256(b"".join(self.prefixes)).digest() != base64.b64decode(expected):
+            return False
+        self.state = update.get("newClientState", "")
+        return True
+
+
+class LocalThreatDatabase:
+    """Safe Browsing Update API client that validates URLs locally.
+
+    A background task syncs threat list hash prefixes with
+    threatListUpdates:fetch. URLs are canonicalized and their expressions
+    hashed locally; only when a hash matches a local prefix is
+    fullHashes:find called, and its answers are cached for the durations
+    the API returns. Most URLs are therefore checked without network I/O.
+    """
+
+    def __init__(self, settings: Settings, threat_types: Optional[list[str]] = None):
+        self.settings = settings
+        self.lists = {t: ThreatList(t) for t in (threat_types or THREAT_TYPES)}
+        self.prefixes = PrefixSet([])
+        self.ready = False
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        # full hash -> expiry of a positive match; prefix -> expiry of a negative answer
+        self._positive_cache: dict[bytes, float] = {}
+        self._negative_cache: dict[bytes, float] = {}
+        self.syncs = 0
+        self.local_checks = 0
+        self.prefix_hits = 0
+        self.full_hash_requests = 0
+
+    @property
+    def _api_url(self) -> str:
+        return self.settings.SAFE_BROWSING_API_URL
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.settings.SAFE_BROWSING_TIMEOUT * 6)
+        )
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def _sync_loop(self) -> None:
+        """Background task that keeps the local prefix lists up to date."""
+        while True:
+            try:
+                wait = await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error syncing Safe Browsing threat lists: {str(e)}")
+                wait = 60
+            await asyncio.sleep(wait)
+
+    async def sync(self) -> float:
+        """Fetch list updates once; returns how long to wait before the next sync."""
+        payload = {
+            "client": CLIENT,
+            "listUpdateRequests": [
+                {
+                    "threatType": threat_list.threat_type,
+                    "platformType": PLATFORM_TYPE,
+                    "threatEntryType": THREAT_ENTRY_TYPE,
+                    "state": threat_list.state,
+                    "constraints": {"supportedCompressions": ["RAW"]},
+                }
+                for threat_list in self.lists.values()
+            ],
+        }
+        async with self._session.post(
+            f"{self._api_url}/threatListUpdates:fetch?key={self.settings.GOOGLE_SAFE_BROWSING_API_KEY}",
+            json=payload
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        # Decoding, sorting and checksumming a full list takes long enough to stall the event loop
+        self.prefixes = await asyncio.to_thread(self._apply_updates, data.get("listUpdateResponses", []))
+        self.ready = all(threat_list.state for threat_list in self.lists.values())
+        self.syncs += 1
+        logger.info(f"Synced Safe Browsing threat lists: {len(self.prefixes)} prefixes")
+        return _parse_seconds(data.get("minimumWaitDuration")) or self.settings.SAFE_BROWSING_UPDATE_INTERVAL
+
+    def _apply_updates(self, updates: list[dict]) -> PrefixSet:
+        """Apply list updates and build the combined prefix set (runs in a worker thread)."""
+        for update in updates:
+            threat_list = self.lists.get(update.get("threatType"))
+            if threat_list and not threat_list.apply(update):
+                logger.warning(f"Checksum mismatch for {threat_list.threat_type}, requesting a full update")
+                threat_list.reset()
+        return PrefixSet([p for threat_list in self.lists.values() for p in threat_list.prefixes])
+
+    async def find_unsafe_urls(self, urls: list[str]) -> set[str]:
+        """Return the URLs whose expressions are confirmed as threats."""
+        self.local_checks += len(urls)
+        now = time.monotonic()
+        unsafe: set[str] = set()
+        # prefix -> [(full hash, url)] that still need a fullHashes:find answer
+        unresolved: dict[bytes, list[tuple[bytes, str]]] = {}
+
+        for url in urls:
+            for full_hash in url_hashes(url):
+                prefix = self.prefixes.match(full_hash)
+                if prefix is None:
+                    continue
+                self.prefix_hits += 1
+                positive_until = self._positive_cache.get(full_hash)
+                if positive_until is not None and positive_until > now:
+                    unsafe.add(url)
+                elif positive_until is not None or self._negative_cache.get(prefix, 0) <= now:
+                    # An expired positive entry must be re-checked even if the prefix is negatively cached
+                    unresolved.setdefault(prefix, []).append((full_hash, url))
+
+        if unresolved:
+            matched = await self._find_full_hashes(list(unresolved))
+            for candidates in unresolved.values():
+                unsafe.update(url for full_hash, url in candidates if full_hash in matched)
+        return unsafe
+
+    async def _find_full_hashes(self, prefixes: list[bytes]) -> set[bytes]:
+        """Ask fullHashes:find about local prefix hits and cache the answers."""
+        self.full_hash_requests += 1
+        payload = {
+            "client": CLIENT,
+            "clientStates": [threat_list.state for threat_list in self.lists.values()],
+            "threatInfo": {
+                "threatTypes": list(self.lists),
+                "platformTypes": [PLATFORM_TYPE],
+                "threatEntryTypes": [THREAT_ENTRY_TYPE],
+                "threatEntries": [{"hash": base64.b64encode(p).decode()} for p in prefixes],
+            },
+        }
+        try:
+            async with self._session.post(
+                f"{self._api_url}/fullHashes:find?key={self.settings.GOOGLE_SAFE_BROWSING_API_KEY}",
+                json=payload
+            ) as response:
+                response.raise_for_status()
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error checking URL safety: {str(e)}"
+            )
+
+        now = time.monotonic()
+        self._prune_caches(now)
+        matched = set()
+        for match in data.get("matches", []):
+            full_hash = base64.b64decode(match["threat"]["hash"])
+            matched.add(full_hash)
+            self._positive_cache[full_hash] = now + _parse_seconds(match.get("cacheDuration"))
+        negative_until = now + _parse_seconds(data.get("negativeCacheDuration"))
+        for prefix in prefixes:
+            self._negative_cache[prefix] = negative_until
+        return matched
+
+    def _prune_caches(self, now: float) -> None:
+        """Drop expired entries so the caches stay bounded by the live answers."""
+        self._positive_cache = {h: until for h, until in self._positive_cache.items() if until > now}
+        self._negative_cache = {p: until for p, until in self._negative_cache.items() if until > now}
+
+    def metrics(self) -> dict:
+        return {
+            "ready": self.ready,
+            "prefixes": len(self.prefixes),
+            "syncs": self.syncs,
+            "local_checks": self.local_checks,
+            "prefix_hits": self.prefix_hits,
+            "full_hash_requests": self.full_hash_requests,
+        }
+
+
+def _parse_seconds(duration: Optional[str]) -> float:
+    """Parse a protobuf Duration string such as ``"593.44s"``."""
+    if not duration:
+        return 0.0
+    return float(duration.rstrip("s"))
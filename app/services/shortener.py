@@ -1,13 +1,20 @@
-from typing import Optional
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, UTC
+from typing import AsyncIterator, Callable, Optional
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import ShortUrl
-from app.db.repository import ShortUrlRepository
+from app.db.repository import ShortUrlReader, ShortUrlRepository
 from app.cache.redis import CacheManagerProtocol
 from app.core.config import Settings as default_settings, settings
 from app.services.generators import ShortCodeGenerator, HashBasedGenerator
 from app.services.url_validator import URLValidator
 from app.core.stats_queue import StatsQueue
+from app.core.single_flight import SingleFlight
+from app.core.rollups import Granularity
+from app.core.trending import TrendingWindow
 
 
 class ShortenService:
@@ -20,7 +27,11 @@ class ShortenService:
         cache_manager: Optional[CacheManagerProtocol] = None,
         repository: Optional[ShortUrlRepository] = None,
         stats_queue: Optional[StatsQueue] = None,
-        settings: Optional[settings] = None
+        settings: Optional[settings] = None,
+        single_flight: Optional[SingleFlight] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        validator: Optional[URLValidator] = None,
+        reader: Optional[ShortUrlReader] = None
     ):
         self.db_session = db_session
         self.repository = repository or ShortUrlRepository(db_session)
@@ -28,11 +39,15 @@ class ShortenService:
         self.cache_manager = cache_manager
         self.stats_queue = stats_queue
         self.settings = settings or default_settings() 
+        self.single_flight = single_flight
+        self.session_factory = session_factory
+        self.validator = validator
+        self.reader = reader
 
     async def create_short_url(self, original_url: str) -> ShortUrl:
         """Creates a new short URL or returns an existing active one."""
         # Validate URL
-        async with URLValidator(self.settings) as validator:
+        async with self._url_validator() as validator:
             await validator.validate_url(str(original_url))
 
         existing_short_url = await self.repository.get_by_original_url(str(original_url))
@@ -43,30 +58,142 @@ class ShortenService:
         new_short_url = await self.repository.create(str(original_url), short_code)
         return new_short_url
 
-    async def resolve_short_url(self, short_code: str) -> Optional[str]:
-        """Resolves a short code to its original URL, caching if found in DB."""
-        original_url = None
+    async def create_short_urls_bulk(self, original_urls: list[str]) -> list[dict]:
+        """Shorten many URLs with one lookup, batched safety checks and chunked INSERTs.
+
+        Returns one result per distinct URL, with either ``short_code`` or ``error``.
+        The whole list is built before returning; nothing is streamed.
+        """
+        urls = list(dict.fromkeys(str(url) for url in original_urls))
+        existing = await self.repository.get_many_by_original_urls(urls)
+        results = [_bulk_result(url, short_url) for url, short_url in existing.items()]
+
+        pending = []
+        async with self._url_validator() as validator:
+            for url in urls:
+                if url in existing:
+                    continue
+                try:
+                    validator.validate_url_format(url)
+                    pending.append(url)
+                except HTTPException as e:
+                    results.append({"original_url": url, "error": e.detail})
+            unsafe = await validator.find_unsafe_urls(pending)
+
+        items, seen_codes = [], set()
+        for url in pending:
+            if url in unsafe:
+                results.append({"original_url": url, "error": "URL is not safe according to Google Safe Browsing"})
+                continue
+            short_code = await self.generator.generate(url)
+            if short_code in seen_codes:
+                results.append({"original_url": url, "error": "Short code collision"})
+                continue
+            seen_codes.add(short_code)
+            items.append((url, short_code))
+
+        created = {row.original_url: row for row in await self.repository.create_many(items)}
+        for url, _ in items:
+            row = created.get(url)
+            results.append(_bulk_result(url, row) if row else {"original_url": url, "error": "Short code collision"})
+        return results
 
-        # First, try to retrieve from cache
+    @asynccontextmanager
+    async def _url_validator(self) -> AsyncIterator[URLValidator]:
+        """The long-lived validator (and its HTTP session) when injected, a temporary one otherwise."""
+        if self.validator:
+            yield self.validator
+        else:
+            async with URLValidator(self.settings) as validator:
+                yield validator
+
+    async def resolve_short_url(self, short_code: str, visitor_id: Optional[str] = None) -> Optional[str]:
+        """Resolves a short code to its original URL, caching if found in DB."""
+        # First, try to retrieve from cache (a cached negative lookup has original_url=None)
         url_data = await self.cache_manager.get_url_mapping(short_code)
         if url_data:
             original_url = url_data["original_url"]
+            if original_url and self._needs_refresh(url_data):
+                self._schedule_refresh(short_code)
+        elif self.single_flight:
+            # Concurrent misses for the same code share one database lookup and cache fill
+            original_url = await self.single_flight.do(
+                short_code, lambda: self._load_url_mapping(short_code, self.repository)
+            )
         else:
-            # If not in cache, retrieve from database
-            short_url_obj = await self.repository.get_by_short_code(short_code)
-            if short_url_obj:
-                # Cache the mapping if found in DB
-                await self.cache_manager.set_url_mapping(
-                    short_code, short_url_obj.original_url, short_url_obj.expires_at
-                )
-                original_url = short_url_obj.original_url
+            original_url = await self._load_url_mapping(short_code, self.repository)
 
         # Queue stats update if we found a valid URL
         if original_url and self.stats_queue:
-            await self.stats_queue.queue_visit(short_code)
+            await self.stats_queue.queue_visit(short_code, visitor_id)
 
         return original_url
 
+    async def _load_url_mapping(self, short_code: str, repository: ShortUrlRepository) -> Optional[str]:
+        """Read a mapping from the database and fill the cache with the result."""
+        lock_ms = self.settings.URL_FILL_LOCK_MS
+        lock_token = None
+        if lock_ms:
+            lock_token = await self.cache_manager.acquire_fill_lock(short_code, lock_ms)
+            if not lock_token:
+                # Another worker is filling this code, give it a moment before querying ourselves
+                url_data = await self._wait_for_fill(short_code, lock_ms)
+                if url_data:
+                    return url_data["original_url"]
+        try:
+            # Prefer the lean Core lookup, fall back to the ORM repository
+            if self.reader:
+                short_url_obj = await self.reader.get_mapping(short_code)
+            else:
+                short_url_obj = await repository.get_by_short_code(short_code)
+            if not short_url_obj:
+                await self.cache_manager.set_missing_mapping(short_code)
+                return None
+            # Cache the mapping if found in DB
+            await self.cache_manager.set_url_mapping(
+                short_code, short_url_obj.original_url, short_url_obj.expires_at
+            )
+            return short_url_obj.original_url
+        finally:
+            if lock_token:
+                await self.cache_manager.release_fill_lock(short_code, lock_token)
+
+    async def _wait_for_fill(self, short_code: str, lock_ms: int, attempts: int = 10) -> Optional[dict]:
+        """Poll the cache while another worker holds the fill lock."""
+        for _ in range(attempts):
+            await asyncio.sleep(lock_ms / 1000 / attempts)
+            url_data = await self.cache_manager.get_url_mapping(short_code)
+            if url_data:
+                return url_data
+        return None
+
+    def _needs_refresh(self, url_data: dict) -> bool:
+        """Whether a cached mapping is close enough to URL_TTL to be refreshed ahead of time."""
+        cached_at = url_data.get("cached_at")
+        if not cached_at or not self.single_flight or not (self.reader or self.session_factory):
+            return False
+        refresh_ahead = self.settings.URL_REFRESH_AHEAD
+        if not refresh_ahead:
+            return False
+        age = datetime.now(UTC).timestamp() - cached_at
+        return age > self.settings.URL_TTL - refresh_ahead
+
+    def _schedule_refresh(self, short_code: str) -> None:
+        """Stale-while-revalidate: serve the cached value and refill it in the background."""
+        async def refresh():
+            if self.reader:
+                await self._load_url_mapping(short_code, self.repository)
+                return
+            # The request's session may be closed before this finishes, use a dedicated one
+            async with self.session_factory() as session:
+                await self._load_url_mapping(short_code, ShortUrlRepository(session))
+
+        self.single_flight.spawn(f"refresh:{short_code}", refresh)
+
+    async def deactivate_short_url(self, short_code: str) -> bool:
+        """Deactivates a short URL; False if the code does not exist."""
+        return await self.repository.deactivate(short_code)
+
     async def get_url_stats(self, short_code: str) -> dict:
         """Get statistics for a short URL."""
         short_url = await self.repository.get_by_short_code(short_code)
@@ -78,10 +205,63 @@ class ShortenService:
             stats_data = await self.stats_queue.get_stats(short_code, short_url.created_at)
             return {
                 "short_code": short_code,
-                "clicks": stats_data.get("clicks", {})
+                "clicks": stats_data.get("clicks", {}),
+                "unique_visitors": stats_data.get("unique_visitors", {})
             }
         
         return {
             "short_code": short_code,
+            "clicks": {},
+            "unique_visitors": {}
+        }
+
+
+    async def get_top_urls(self, window: TrendingWindow, n: int) -> dict:
+        """Get the most clicked short URLs within a time window."""
+        if self.stats_queue:
+            return await self.stats_queue.get_top(window, n)
+        return {"window": window, "items": []}
+
+    async def get_url_stats_range(
+        self, short_code: str, start: datetime, end: datetime, granularity: Granularity
+    ) -> dict:
+        """Get per-minute, per-hour or per-day clicks of a short URL over a time range."""
+        short_url = await self.repository.get_by_short_code(short_code)
+        if not short_url:
+            raise ValueError("URL not found")
+
+        if self.stats_queue:
+            return await self.stats_queue.get_stats_range(short_code, start, end, granularity)
+        return {
+            "short_code": short_code,
+            "granularity": granularity,
             "clicks": {}
         }
+
+    async def get_url_stats_batch(self, short_codes: list[str], start: date, end: date) -> dict:
+        """Get statistics for many short URLs with one existence query and one Redis round trip."""
+        codes = list(dict.fromkeys(short_codes))
+        if self.reader:
+            existing = await self.reader.existing_short_codes(codes)
+        else:
+            existing = await self.repository.existing_short_codes(codes)
+        found = [code for code in codes if code in existing]
+
+        stats = []
+        if self.stats_queue:
+            stats = await self.stats_queue.get_stats_many(found, start, end)
+        return {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "stats": stats,
+            "not_found": [code for code in codes if code not in existing],
+        }
+
+
+def _bulk_result(original_url: str, short_url) -> dict:
+    """One NDJSON line of a bulk shorten response."""
+    return {
+        "original_url": original_url,
+        "short_code": short_url.short_code,
+        "created_at": short_url.created_at.isoformat() if short_url.created_at else None,
+    }
@@ -1,24 +1,71 @@
+import asyncio
+import hashlib
+import logging
 from typing import Optional
 from urllib.parse import urlparse
 import aiohttp
 from fastapi import HTTPException
+from redis.asyncio import Redis
 from app.core.config import Settings
+from app.core.micro_batcher import MicroBatcher
+from app.services.safe_browsing_local import LocalThreatDatabase
+
+# threatMatches:find accepts at most 500 threatEntries per request
+SAFE_BROWSING_MAX_ENTRIES = 500
+
+UNSAFE, SAFE = "1", "0"
+
+logger = logging.getLogger(__name__)
 
 
 class URLValidator:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        redis: Optional[Redis] = None,
+        local_db: Optional[LocalThreatDatabase] = None
+    ):
         self.settings = settings
+        self.redis = redis
+        self.local_db = local_db
+        self.batcher: MicroBatcher[str, bool] = MicroBatcher(
+            self._check_batch,
+            max_batch_size=min(settings.SAFE_BROWSING_BATCH_SIZE, SAFE_BROWSING_MAX_ENTRIES),
+            max_wait=settings.SAFE_BROWSING_BATCH_WAIT_MS / 1000
+        )
         self._session: Optional[aiohttp.ClientSession] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-    async def __aenter__(self):
-        self._session = aiohttp.ClientSession()
-        return self
+    async def start(self) -> None:
+        """Open the keep-alive HTTP session used for Safe Browsing checks."""
+        if not self._session:
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.SAFE_BROWSING_MAX_CONNECTIONS,
+                keepalive_timeout=self.settings.SAFE_BROWSING_KEEPALIVE,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.settings.SAFE_BROWSING_TIMEOUT)
+            )
+            if self.local_db:
+                await self.local_db.start()
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def close(self) -> None:
+        if self.local_db:
+            await self.local_db.stop()
         if self._session:
             await self._session.close()
             self._session = None
 
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     def validate_url_format(self, url: str) -> None:
         """Validate URL format."""
         try:
@@ -32,13 +79,65 @@ class URLValidator:
             )
 
     async def check_safe_browsing(self, url: str) -> None:
-        """Check URL against Google Safe Browsing API."""
+        """Check URL against Google Safe Browsing API.
+
+        Concurrent checks are micro-batched into a single threatMatches:find request.
+        """
         if not self.settings.GOOGLE_SAFE_BROWSING_API_KEY:
             return
+        if await self.batcher.submit(url):
+            raise HTTPException(
+                status_code=400,
+                detail="URL is not safe according to Google Safe Browsing"
+            )
+
+    async def _check_batch(self, urls: list[str]) -> dict[str, bool]:
+        unsafe = await self.find_unsafe_urls(urls)
+        return {url: url in unsafe for url in urls}
+
+    async def find_unsafe_urls(self, urls: list[str]) -> set[str]:
+        """Return the URLs flagged by Google Safe Browsing, checking up to 500 URLs per request.
+
+        Verdicts are cached in Redis: unsafe ones for the ``cacheDuration`` returned
+        by the API, safe ones for SAFE_BROWSING_SAFE_TTL seconds. Once the local
+        threat lists are synced (SAFE_BROWSING_MODE=update), URLs are checked
+        against them instead.
+        """
+        if not self.settings.GOOGLE_SAFE_BROWSING_API_KEY or not urls:
+            return set()
+
+        if self.local_db and self.local_db.ready:
+            return await self.local_db.find_unsafe_urls(urls)
 
         if not self._session:
             raise RuntimeError("Session not initialized. Use async context manager.")
 
+        cached = await self._get_cached_verdicts(urls)
+        unsafe = {url for url, verdict in cached.items() if verdict == UNSAFE}
+        pending = [url for url in urls if url not in cached]
+        self.cache_hits += len(cached)
+        self.cache_misses += len(pending)
+        if not pending:
+            return unsafe
+
+        chunks = [pending[i:i + SAFE_BROWSING_MAX_ENTRIES] for i in range(0, len(pending), SAFE_BROWSING_MAX_ENTRIES)]
+        matches: dict[str, int] = {}
+        answered: list[str] = []
+        results = await asyncio.gather(*[self._find_threats(chunk) for chunk in chunks])
+        for chunk, result in zip(chunks, results):
+            # Chunks without a verdict pass unchecked and are not cached
+            if result is not None:
+                matches.update(result)
+                answered.extend(chunk)
+        await self._cache_verdicts(answered, matches)
+        return unsafe | set(matches)
+
+    async def _find_threats(self, urls: list[str]) -> Optional[dict[str, int]]:
+        """Send one threatMatches:find request and return matched URLs with their cache TTL.
+
+        A non-200 answer (quota exceeded, outage) carries no verdict: it returns
+        None when SAFE_BROWSING_FAIL_OPEN is set and raises otherwise.
+        """
         payload = {
             "client": {
                 "clientId": "slink",
@@ -48,29 +147,70 @@ class URLValidator:
                 "threatTypes": ["MALWARE", "SOCIAL_ENGINEERING", "UNWANTED_SOFTWARE", "POTENTIALLY_HARMFUL_APPLICATION"],
                 "platformTypes": ["ANY_PLATFORM"],
                 "threatEntryTypes": ["URL"],
-                "threatEntries": [{"url": str(url)}]
+                "threatEntries": [{"url": str(url)} for url in urls]
             }
         }
 
         try:
             async with self._session.post(
-                f"https://safebrowsing.googleapis.com/v4/threatMatches:find?key={self.settings.GOOGLE_SAFE_BROWSING_API_KEY}",
+                f"{self.settings.SAFE_BROWSING_API_URL}/threatMatches:find?key={self.settings.GOOGLE_SAFE_BROWSING_API_KEY}",
                 json=payload
             ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data:  # If there's a match, the URL is unsafe
-                        raise HTTPException(
-                            status_code=400,
-                            detail="URL is not safe according to Google Safe Browsing"
-                        )
-        except aiohttp.ClientError as e:
+                if response.status != 200:
+                    if self.settings.SAFE_BROWSING_FAIL_OPEN:
+                        logger.warning(f"Safe Browsing returned HTTP {response.status}, {len(urls)} URLs unchecked")
+                        return None
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Error checking URL safety: Safe Browsing returned HTTP {response.status}"
+                    )
+                data = await response.json()
+                # If there's a match, the URL is unsafe
+                return {
+                    match["threat"]["url"]: _parse_duration(match.get("cacheDuration"))
+                    for match in data.get("matches", [])
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Error checking URL safety: {str(e)}"
             )
 
+    async def _get_cached_verdicts(self, urls: list[str]) -> dict[str, str]:
+        if not self.redis:
+            return {}
+        verdicts = await self.redis.mget([_verdict_key(url) for url in urls])
+        return {url: verdict for url, verdict in zip(urls, verdicts) if verdict is not None}
+
+    async def _cache_verdicts(self, urls: list[str], matches: dict[str, int]) -> None:
+        if not self.redis:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for url in urls:
+                if url in matches:
+                    pipe.setex(_verdict_key(url), matches[url] or self.settings.SAFE_BROWSING_SAFE_TTL, UNSAFE)
+                else:
+                    pipe.setex(_verdict_key(url), self.settings.SAFE_BROWSING_SAFE_TTL, SAFE)
+            await pipe.execute()
+
+    def metrics(self) -> dict:
+        metrics = {"verdict_cache_hits": self.cache_hits, "verdict_cache_misses": self.cache_misses}
+        if self.local_db:
+            metrics["local_db"] = self.local_db.metrics()
+        return metrics
+
     async def validate_url(self, url: str) -> None:
         """Validate URL format and safety."""
         self.validate_url_format(url)
-        await self.check_safe_browsing(url) 
\ No newline at end of file
+        await self.check_safe_browsing(url)
+
+
+def _verdict_key(url: str) -> str:
+    return f"sb:verdict:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def _parse_duration(duration: Optional[str]) -> int:
+    """Parse a protobuf Duration string such as ``"300s"`` or ``"1.5s"`` into whole seconds."""
+    if not duration:
+        return 0
+    return int(float(duration.rstrip("s")))
@@ -0,0 +1,46 @@
+"""Add lookup indexes on short_urls
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Tables are still created by ``Base.metadata.create_all`` in lifespan; this
+revision adds the lookup indexes to databases created before they existed.
+Indexes are built CONCURRENTLY so large tables stay writable.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_short_urls_original_url_hash",
+            "short_urls",
+            ["original_url"],
+            postgresql_using="hash",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_short_urls_active_short_code",
+            "short_urls",
+            ["short_code", "expires_at"],
+            postgresql_include=["original_url"],
+            postgresql_where=sa.text("is_active IS NOT false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_short_urls_active_short_code", table_name="short_urls", postgresql_concurrently=True)
+        op.drop_index("ix_short_urls_original_url_hash", table_name="short_urls", postgresql_concurrently=True)
@@ -0,0 +1,25 @@
+"""Add the sequence that BlockSequenceGenerator leases ID blocks from
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(
+        sa.Sequence("short_code_id_seq", start=10**8, increment=1000), if_not_exists=True
+    ))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence("short_code_id_seq"), if_exists=True))
@@ -0,0 +1,32 @@
+"""Add the checkpoint table of the write-behind click_count flusher
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "click_flush_checkpoints",
+        sa.Column("batch_id", sa.String(), primary_key=True),
+        sa.Column("applied_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_click_flush_checkpoints_applied_at", "click_flush_checkpoints", ["applied_at"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_click_flush_checkpoints_applied_at", table_name="click_flush_checkpoints")
+    op.drop_table("click_flush_checkpoints")
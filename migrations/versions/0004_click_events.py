@@ -0,0 +1,34 @@
+"""Add the day-partitioned click_events archive
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Daily partitions are created at runtime by ClickPartitionManager
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS click_events ("
+        " occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,"
+        " short_code VARCHAR NOT NULL,"
+        " visitor_id VARCHAR"
+        ") PARTITION BY RANGE (occurred_at)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_click_events_short_code_occurred_at"
+        " ON click_events (short_code, occurred_at)"
+    )
+    op.execute("CREATE TABLE IF NOT EXISTS click_events_default PARTITION OF click_events DEFAULT")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS click_events")
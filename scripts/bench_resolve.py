@@ -0,0 +1,63 @@
+"""Compare the ORM and the lean Core lookup used on redirect cache misses.
+
+Usage: python -m scripts.bench_resolve [iterations]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import select
+
+from app.db.models import ShortUrl
+from app.db.repository import ShortUrlReader, ShortUrlRepository
+from app.db.session import Base, async_session, engine
+
+BENCH_CODE = "bench-resolve"
+
+
+async def ensure_row() -> None:
+    """Insert the benchmark short URL if it does not exist yet."""
+    async with async_session() as session:
+        result = await session.execute(select(ShortUrl.id).where(ShortUrl.short_code == BENCH_CODE))
+        if result.first() is None:
+            session.add(ShortUrl(
+                original_url="https://example.com/bench",
+                short_code=BENCH_CODE,
+                expires_at=datetime.now(UTC) + timedelta(days=365)
+            ))
+            await session.commit()
+
+
+async def bench_orm(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        async with async_session() as session:
+            await ShortUrlRepository(session).get_by_short_code(BENCH_CODE)
+    return time.perf_counter() - start
+
+
+async def bench_core(iterations: int) -> float:
+    reader = ShortUrlReader(engine)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await reader.get_mapping(BENCH_CODE)
+    return time.perf_counter() - start
+
+
+async def main(iterations: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await ensure_row()
+    # Warm up the pool and the statement caches
+    await bench_orm(50)
+    await bench_core(50)
+
+    for name, bench in (("orm", bench_orm), ("core", bench_core)):
+        elapsed = await bench(iterations)
+        print(f"{name:>5}: {iterations / elapsed:10.0f} lookups/s  {elapsed / iterations * 1e6:8.1f} us/lookup")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -53,7 +53,13 @@ async def override_get_db(test_db: AsyncSession):
 
 # Create test client
 @pytest_asyncio.fixture
-async def async_client(override_get_db) -> AsyncGenerator[AsyncClient, None]:
-    """Create a test client."""
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac 
\ No newline at end of file
+async def async_client(override_get_db, test_engine) -> AsyncGenerator[AsyncClient, None]:
+    """Create a test client with the lifespan resources (Redis pool, stats queue) started."""
+    # The container's own database users (reader, ID leases, archive) use the test engine too
+    app.state.db_engine = test_engine
+    try:
+        async with app.router.lifespan_context(app):
+            async with AsyncClient(app=app, base_url="http://test") as ac:
+                yield ac
+    finally:
+        del app.state.db_engine 
\ No newline at end of file
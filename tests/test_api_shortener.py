@@ -1,3 +1,4 @@
+import json
 import pytest
 from httpx import AsyncClient
 from app.main import app
@@ -38,9 +39,78 @@ async def test_stats_clicks_accumulate(async_client: AsyncClient):
     # 模擬多次訪問
     for _ in range(3):
         await async_client.get(f"/{short_code}")
+    # 點擊由背景任務消化，這裡手動 drain 一次
+    await app.state.container.stats_queue.process_visits()
     # 查詢統計
     resp2 = await async_client.get(f"/api/stats/{short_code}")
     assert resp2.status_code == 200
     data = resp2.json()
     assert "clicks" in data
-    assert sum(data["clicks"].values()) >= 3  # 點擊數應累加 
\ No newline at end of file
+    assert sum(data["clicks"].values()) >= 3  # 點擊數應累加 
+
+@pytest.mark.asyncio
+async def test_create_short_urls_bulk(async_client: AsyncClient):
+    urls = ["https://example.org/bulk/1", "https://example.org/bulk/2", "https://example.org/bulk/1"]
+    resp = await async_client.post("/api/shorten/bulk", json={"original_urls": urls})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(lines) == 2
+    assert all("short_code" in line for line in lines)
+
+@pytest.mark.asyncio
+async def test_stats_batch(async_client: AsyncClient):
+    # 先產生短網址並訪問一次
+    resp = await async_client.post("/api/shorten", json={"original_url": "https://example.org/stats-batch"})
+    short_code = resp.json()["short_code"]
+    await async_client.get(f"/{short_code}")
+    await app.state.container.stats_queue.process_visits()
+    # 一次查詢多個短網址，不存在的短網址列在 not_found
+    resp2 = await async_client.post("/api/stats/batch", json={"short_codes": [short_code, "doesnotexist"]})
+    assert resp2.status_code == 200
+    data = resp2.json()
+    assert data["not_found"] == ["doesnotexist"]
+    assert data["stats"][0]["short_code"] == short_code
+    assert len(data["stats"][0]["clicks"]) == 7
+    assert sum(data["stats"][0]["clicks"].values()) >= 1
+
+@pytest.mark.asyncio
+async def test_stats_batch_invalid_range(async_client: AsyncClient):
+    resp = await async_client.post(
+        "/api/stats/batch",
+        json={"short_codes": ["abc123"], "start_date": "2024-02-01", "end_date": "2024-01-01"}
+    )
+    assert resp.status_code == 422
+
+@pytest.mark.asyncio
+async def test_stats_range_by_minute(async_client: AsyncClient):
+    # 先產生短網址並訪問一次
+    resp = await async_client.post("/api/shorten", json={"original_url": "https://example.org/stats-range"})
+    short_code = resp.json()["short_code"]
+    await async_client.get(f"/{short_code}")
+    await app.state.container.stats_queue.process_visits()
+    # 以分鐘為單位查詢最近一小時
+    resp2 = await async_client.get(f"/api/stats/{short_code}", params={"granularity": "minute"})
+    assert resp2.status_code == 200
+    data = resp2.json()
+    assert data["granularity"] == "minute"
+    assert len(data["clicks"]) == 60
+    assert sum(data["clicks"].values()) >= 1
+    # 未帶參數時維持原本的 7 天格式
+    resp3 = await async_client.get(f"/api/stats/{short_code}")
+    assert len(resp3.json()["clicks"]) == 7
+
+@pytest.mark.asyncio
+async def test_stats_top(async_client: AsyncClient):
+    # 先產生短網址並訪問數次
+    resp = await async_client.post("/api/shorten", json={"original_url": "https://example.org/trending"})
+    short_code = resp.json()["short_code"]
+    for _ in range(3):
+        await async_client.get(f"/{short_code}")
+    await app.state.container.stats_queue.process_visits()
+    await app.state.container.redis.delete("url:trending:top:5m")
+    # 查詢最近 5 分鐘的熱門短網址
+    resp2 = await async_client.get("/api/stats/top", params={"window": "5m", "n": 10})
+    assert resp2.status_code == 200
+    items = resp2.json()["items"]
+    assert any(item["short_code"] == short_code and item["clicks"] >= 3 for item in items)
@@ -0,0 +1,49 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, UTC
+from unittest.mock import AsyncMock, MagicMock
+
+from app.db.click_archive import ClickPartitionManager, partition_name
+
+
+def _engine(existing: list[str], fail_on: str) -> tuple[MagicMock, list[list[str]]]:
+    """Engine whose transactions record their SQL; statements containing ``fail_on`` raise."""
+    transactions = []
+
+    @asynccontextmanager
+    async def begin():
+        statements = []
+        transactions.append(statements)
+
+        async def execute(statement, *args):
+            sql = str(statement)
+            statements.append(sql)
+            if fail_on in sql:
+                raise RuntimeError("default partition holds rows of this range")
+            return MagicMock(scalars=MagicMock(return_value=existing))
+
+        conn = MagicMock()
+        conn.execute = execute
+        yield conn
+
+    engine = MagicMock()
+    engine.begin = begin
+    return engine, transactions
+
+
+@pytest.mark.asyncio
+async def test_failed_partition_create_does_not_undo_drops():
+    today = datetime.now(UTC).date()
+    expired = partition_name(today - timedelta(days=100))
+    existing = ["click_events_default", expired]
+    failing = partition_name(today)
+    engine, transactions = _engine(existing, fail_on=f"CREATE TABLE IF NOT EXISTS {failing} ")
+    manager = ClickPartitionManager(engine, days_ahead=1, retention_days=90)
+
+    created, dropped = await manager.maintain()
+
+    assert failing not in created and len(created) == 2
+    assert dropped == [expired]
+    # One transaction per partition create and drop, besides the listing and the default trim
+    assert any(statements == [f"DROP TABLE IF EXISTS {expired}"] for statements in transactions)
+    assert any("ATTACH PARTITION" in sql for statements in transactions for sql in statements)
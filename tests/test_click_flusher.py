@@ -0,0 +1,51 @@
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.click_flusher import FLUSHING_KEY, ClickCountFlusher
+
+
+def _engine(conn) -> MagicMock:
+    @asynccontextmanager
+    async def begin():
+        yield conn
+
+    engine = MagicMock()
+    engine.begin = begin
+    return engine
+
+
+def _redis(batch: dict) -> MagicMock:
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=True)
+    redis.renamenx = AsyncMock(return_value=True)
+    redis.hsetnx = AsyncMock()
+    redis.hgetall = AsyncMock(return_value=batch)
+    redis.delete = AsyncMock()
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_flush_applies_batch_in_one_transaction():
+    conn = MagicMock()
+    conn.execute = AsyncMock(return_value=MagicMock(first=MagicMock(return_value=("batch-1",))))
+    redis = _redis({"_batch": "batch-1", "abc123": "3", "xyz789": "2"})
+    flusher = ClickCountFlusher(redis, _engine(conn))
+
+    assert await flusher.flush() == 5
+    # checkpoint insert, one UPDATE ... FROM (VALUES ...), checkpoint cleanup
+    assert conn.execute.await_count == 3
+    redis.delete.assert_any_await(FLUSHING_KEY)
+
+
+@pytest.mark.asyncio
+async def test_flush_skips_batch_that_was_already_applied():
+    conn = MagicMock()
+    conn.execute = AsyncMock(return_value=MagicMock(first=MagicMock(return_value=None)))
+    redis = _redis({"_batch": "batch-1", "abc123": "3"})
+    flusher = ClickCountFlusher(redis, _engine(conn))
+
+    assert await flusher.flush() == 0
+    assert conn.execute.await_count == 1
+    assert flusher.skipped_batches == 1
+    redis.delete.assert_any_await(FLUSHING_KEY)
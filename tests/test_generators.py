@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import ANY, AsyncMock, MagicMock
+from app.services.code_pool import CodePool
+from app.db.models import ID_OFFSET, REDIS_ID_OFFSET
+from app.services.generators import (
+    BlockSequenceGenerator, HashBasedGenerator, PooledRandomGenerator, RedisBlockAllocator
+)
+
+
+class FakeAllocator:
+    """Hands out consecutive blocks like the sequence/INCRBY allocators do."""
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self.next_start = 0
+        self.leases = 0
+
+    async def lease(self) -> range:
+        self.leases += 1
+        start = self.next_start
+        self.next_start += self.block_size
+        return range(start, start + self.block_size)
+
+
+@pytest.mark.asyncio
+async def test_block_sequence_generator_is_unique_across_workers():
+    allocator = FakeAllocator(block_size=10)
+    workers = [BlockSequenceGenerator(allocator, salt="salt") for _ in range(3)]
+    codes = [await worker.generate("https://test.com") for _ in range(25) for worker in workers]
+    assert len(set(codes)) == len(codes)
+    # 75 codes from 10-ID blocks: each worker leases ceil(25 / 10) blocks
+    assert allocator.leases == 9
+
+
+@pytest.mark.asyncio
+async def test_redis_allocator_leases_outside_the_sequence_range():
+    redis = MagicMock()
+    redis.incrby = AsyncMock(return_value=1000)
+    block = await RedisBlockAllocator(redis, block_size=1000).lease()
+    assert block == range(REDIS_ID_OFFSET, REDIS_ID_OFFSET + 1000)
+    assert block.start > ID_OFFSET
+
+
+@pytest.mark.asyncio
+async def test_hash_based_generator_is_deterministic():
+    assert await HashBasedGenerator(salt="salt").generate("https://test.com") == \
+        await HashBasedGenerator(salt="salt").generate("https://test.com")
+
+
+@pytest.mark.asyncio
+async def test_code_pool_refill_skips_codes_already_in_use():
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=True)
+    redis.eval = AsyncMock(return_value=1)
+    redis.scard = AsyncMock(return_value=0)
+    redis.sadd = AsyncMock(side_effect=lambda key, *codes: len(codes))
+    reader = MagicMock()
+    reader.existing_short_codes = AsyncMock(side_effect=lambda codes, active_only: {codes[0]})
+    pool = CodePool(redis=redis, reader=reader, target_size=50, low_water=10)
+    added = await pool.refill()
+    taken = reader.existing_short_codes.await_args.args[0][0]
+    assert taken not in redis.sadd.await_args.args[1:]
+    assert added == len(redis.sadd.await_args.args) - 1
+    # The lock is released with the token it was taken with
+    token = redis.set.await_args.args[1]
+    assert redis.eval.await_args.args[1:] == (1, pool.lock_key, token)
+
+
+@pytest.mark.asyncio
+async def test_code_pool_refill_is_skipped_while_another_worker_holds_the_lock():
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=None)
+    redis.scard = AsyncMock(return_value=0)
+    pool = CodePool(redis=redis, reader=MagicMock(), target_size=50, low_water=10)
+    assert await pool.refill() == 0
+    redis.set.assert_awaited_once_with(pool.lock_key, ANY, nx=True, px=pool.lock_ms)
+    redis.scard.assert_not_called()
+    redis.eval.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pooled_random_generator_falls_back_when_pool_is_empty():
+    pool = MagicMock()
+    pool.pop = AsyncMock(return_value=None)
+    fallback = AsyncMock()
+    fallback.generate.return_value = "fresh1"
+    pool.reader.existing_short_codes = AsyncMock(return_value=set())
+    assert await PooledRandomGenerator(pool, fallback=fallback).generate("https://test.com") == "fresh1"
+
+
+@pytest.mark.asyncio
+async def test_pooled_random_generator_fallback_skips_codes_already_in_use():
+    pool = MagicMock()
+    pool.pop = AsyncMock(return_value=None)
+    pool.reader.existing_short_codes = AsyncMock(return_value={"taken1"})
+    fallback = AsyncMock()
+    fallback.generate.side_effect = ["taken1", "fresh2", "fresh3"]
+    assert await PooledRandomGenerator(pool, fallback=fallback).generate("https://test.com") == "fresh2"
+    pool.reader.existing_short_codes.assert_awaited_once_with(["taken1", "fresh2", "fresh3"], active_only=False)
@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timedelta, UTC
+from app.cache.local import LocalCache, LocalCacheManager
+from app.cache.locks import RELEASE_SCRIPT
+from app.cache.redis import RedisCacheManager
+from app.cache.invalidation import CacheInvalidator, INVALIDATION_CHANNEL
+from app.db.repository import ShortUrlRepository
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b", None) is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_local_cache_expires_entries():
+    clock = FakeClock()
+    cache = LocalCache(maxsize=10, clock=clock)
+    cache.set("a", 1, ttl=5)
+    clock.now = 6
+    assert cache.get("a", None) is None
+    assert cache.stats()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_cache_manager_serves_hot_codes_from_memory():
+    inner = AsyncMock()
+    expires_at = (datetime.now(UTC) + timedelta(days=1)).isoformat()
+    inner.get_url_mapping = AsyncMock(return_value={"original_url": "https://test.com", "expires_at": expires_at})
+    manager = LocalCacheManager(inner=inner, cache=LocalCache(maxsize=10), ttl=60, negative_ttl=5)
+    for _ in range(3):
+        data = await manager.get_url_mapping("abc123")
+        assert data["original_url"] == "https://test.com"
+    inner.get_url_mapping.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_local_cache_manager_skips_expired_mapping():
+    inner = AsyncMock()
+    expires_at = (datetime.now(UTC) - timedelta(seconds=1)).isoformat()
+    inner.get_url_mapping = AsyncMock(return_value={"original_url": "https://test.com", "expires_at": expires_at})
+    manager = LocalCacheManager(inner=inner, cache=LocalCache(maxsize=10), ttl=60, negative_ttl=5)
+    assert await manager.get_url_mapping("abc123") is None
+
+
+@pytest.mark.asyncio
+async def test_local_cache_manager_caches_negative_lookups():
+    inner = AsyncMock()
+    manager = LocalCacheManager(inner=inner, cache=LocalCache(maxsize=10), ttl=60, negative_ttl=5)
+    await manager.set_missing_mapping("nope")
+    assert await manager.get_url_mapping("nope") == {"original_url": None}
+    inner.get_url_mapping.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_invalidator_publish_evicts_local_entry():
+    cache = LocalCache(maxsize=10)
+    cache.set("abc123", {"original_url": "https://test.com"}, ttl=60)
+    redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    await CacheInvalidator(redis, cache).publish("abc123")
+    assert cache.get("abc123", None) is None
+    pipe.delete.assert_called_once_with("url:abc123")
+    pipe.publish.assert_called_once_with(INVALIDATION_CHANNEL, "abc123")
+
+
+@pytest.mark.asyncio
+async def test_deactivate_clears_local_and_redis_caches_after_commit():
+    cache = LocalCache(maxsize=10)
+    cache.set("abc123", {"original_url": "https://test.com"}, ttl=60)
+    redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    db_session = MagicMock()
+    db_session.execute = AsyncMock(return_value=MagicMock(rowcount=1))
+    db_session.commit = AsyncMock(side_effect=lambda: pipe.delete.assert_not_called())
+    repository = ShortUrlRepository(db_session, invalidator=CacheInvalidator(redis, cache))
+
+    assert await repository.deactivate("abc123") is True
+    db_session.commit.assert_awaited_once()
+    assert cache.get("abc123", None) is None
+    pipe.delete.assert_called_once_with("url:abc123")
+    pipe.publish.assert_called_once_with(INVALIDATION_CHANNEL, "abc123")
+
+
+@pytest.mark.asyncio
+async def test_fill_lock_is_released_only_with_its_own_token():
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=True)
+    redis.eval = AsyncMock(return_value=0)
+    manager = RedisCacheManager(redis, stats_layout=MagicMock())
+    token = await manager.acquire_fill_lock("abc123", 500)
+    assert token and redis.set.await_args.args == ("lock:url:abc123", token)
+    await manager.release_fill_lock("abc123", token)
+    redis.eval.assert_awaited_once_with(RELEASE_SCRIPT, 1, "lock:url:abc123", token)
+    redis.delete.assert_not_called()
+
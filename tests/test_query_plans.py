@@ -0,0 +1,117 @@
+import json
+import os
+import pytest
+import pytest_asyncio
+from unittest.mock import MagicMock
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.db.repository import ShortUrlReader, ShortUrlRepository
+from app.db.session import Base
+
+# Inserts PLAN_TEST_ROWS rows (inside a transaction that is rolled back), so opt in explicitly
+pytestmark = pytest.mark.skipif(
+    not os.getenv("RUN_PLAN_TESTS"), reason="set RUN_PLAN_TESTS=1 to run the query plan tests"
+)
+
+# Large enough that the planner would never pick an index for a tiny table by accident
+PLAN_TEST_ROWS = int(os.getenv("PLAN_TEST_ROWS", "2000000"))
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON)`` of a statement, compiled with its bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class StatementRecorder:
+    """Stands in for both a session and an engine and records the statements executed on it."""
+
+    def __init__(self):
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return MagicMock()
+
+
+async def _short_code_lookup(recorder):
+    await ShortUrlReader(recorder).get_mapping("plan-1234567")
+
+
+async def _original_url_lookup(recorder):
+    await ShortUrlRepository(recorder).get_by_original_url("https://example.com/plan/1234567")
+
+
+async def _original_urls_lookup(recorder):
+    await ShortUrlRepository(recorder).get_many_by_original_urls(["https://example.com/plan/1234567"])
+
+
+PLAN_LOOKUPS = {
+    "short_code": _short_code_lookup,
+    "original_url": _original_url_lookup,
+    "original_urls": _original_urls_lookup,
+}
+
+
+@pytest_asyncio.fixture(scope="module")
+async def populated_conn(test_engine):
+    """A connection whose open transaction holds PLAN_TEST_ROWS synthetic rows; rolled back afterwards."""
+    if test_engine.dialect.name != "postgresql":
+        pytest.skip("query plan tests require PostgreSQL")
+    async with test_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text(
+                "INSERT INTO short_urls (original_url, short_code, expires_at, is_active, click_count) "
+                "SELECT 'https://example.com/plan/' || g, 'plan-' || g, now() + interval '30 days', true, 0 "
+                "FROM generate_series(1, :rows) AS g "
+                "ON CONFLICT (short_code) DO NOTHING"
+            ), {"rows": PLAN_TEST_ROWS})
+            await conn.execute(text("ANALYZE short_urls"))
+            yield conn
+        finally:
+            await transaction.rollback()
+
+
+def _node_types(plan: dict) -> set[str]:
+    types = {plan["Node Type"]}
+    for child in plan.get("Plans", []):
+        types |= _node_types(child)
+    return types
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lookup_name", PLAN_LOOKUPS)
+async def test_lookup_uses_index(populated_conn, lookup_name):
+    # Explain the statement the code actually builds, so the test cannot drift from it
+    recorder = StatementRecorder()
+    await PLAN_LOOKUPS[lookup_name](recorder)
+    [statement] = recorder.statements
+
+    raw_plan = await populated_conn.scalar(Explain(statement))
+    plan = json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan
+    node_types = _node_types(plan[0]["Plan"])
+    assert "Seq Scan" not in node_types
+    assert node_types & INDEX_NODES
@@ -0,0 +1,142 @@
+import base64
+import hashlib
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from aiohttp import web
+
+from app.services.safe_browsing_local import (
+    LocalThreatDatabase, PrefixSet, ThreatList, canonicalize_url, url_expressions, url_hashes
+)
+
+MALWARE_URL = "http://malware.test/download/payload.exe"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://host/%25%32%35", "http://host/%25"),
+    ("http://host/%%%25%32%35asd%%", "http://host/%25%25%25asd%25%25"),
+    ("http://3279880203/blah", "http://195.127.0.11/blah"),
+    ("http://www.google.com/blah/..", "http://www.google.com/"),
+    ("www.google.com", "http://www.google.com/"),
+    ("http://www.GOOgle.com.../", "http://www.google.com/"),
+    ("http://www.evil.com/blah#frag", "http://www.evil.com/blah"),
+    ("http://www.gotaport.com:1234/", "http://www.gotaport.com/"),
+    ("http://host.com//twoslashes?more//slashes", "http://host.com/twoslashes?more//slashes"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_url_expressions():
+    assert url_expressions("http://a.b.c/1/2.html?param=1") == [
+        "a.b.c/1/2.html?param=1", "a.b.c/1/2.html", "a.b.c/", "a.b.c/1/",
+        "b.c/1/2.html?param=1", "b.c/1/2.html", "b.c/", "b.c/1/",
+    ]
+
+
+def test_partial_update_applies_removals_and_verifies_checksum():
+    threat_list = ThreatList("MALWARE")
+    full = {
+        "responseType": "FULL_UPDATE",
+        "additions": [{"rawHashes": {"prefixSize": 4, "rawHashes": base64.b64encode(b"ccccaaaabbbb").decode()}}],
+        "newClientState": "s1",
+        "checksum": {"sha256": base64.b64encode(hashlib.sha256(b"aaaabbbbcccc").digest()).decode()},
+    }
+    assert threat_list.apply(full)
+    partial = {
+        "responseType": "PARTIAL_UPDATE",
+        "removals": [{"rawIndices": {"indices": [1]}}],
+        "newClientState": "s2",
+        "checksum": {"sha256": base64.b64encode(hashlib.sha256(b"aaaacccc").digest()).decode()},
+    }
+    assert threat_list.apply(partial)
+    assert threat_list.prefixes == [b"aaaa", b"cccc"]
+    assert threat_list.state == "s2"
+    assert not threat_list.apply({"responseType": "PARTIAL_UPDATE", "checksum": {"sha256": "AAAA"}})
+
+
+@pytest_asyncio.fixture
+async def update_api_stub():
+    """Local stand-in for the Safe Browsing Update API listing MALWARE_URL."""
+    malware_hash = url_hashes(MALWARE_URL)[0]
+    full_hash_requests = []
+
+    async def fetch(request: web.Request) -> web.Response:
+        payload = await request.json()
+        return web.json_response({
+            "listUpdateResponses": [
+                {
+                    "threatType": list_request["threatType"],
+                    "responseType": "FULL_UPDATE",
+                    "additions": [{"rawHashes": {
+                        "prefixSize": 4, "rawHashes": base64.b64encode(malware_hash[:4]).decode()
+                    }}],
+                    "newClientState": "state-1",
+                }
+                for list_request in payload["listUpdateRequests"]
+            ],
+            "minimumWaitDuration": "600s",
+        })
+
+    async def find(request: web.Request) -> web.Response:
+        payload = await request.json()
+        full_hash_requests.append(payload["threatInfo"]["threatEntries"])
+        return web.json_response({
+            "matches": [{
+                "threatType": "MALWARE",
+                "threat": {"hash": base64.b64encode(malware_hash).decode()},
+                "cacheDuration": "300s",
+            }],
+            "negativeCacheDuration": "300s",
+        })
+
+    app = web.Application()
+    app.router.add_post("/v4/threatListUpdates:fetch", fetch)
+    app.router.add_post("/v4/fullHashes:find", find)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/v4", full_hash_requests
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_local_database_only_calls_api_on_prefix_hit(update_api_stub):
+    api_url, full_hash_requests = update_api_stub
+    settings = MagicMock(
+        GOOGLE_SAFE_BROWSING_API_KEY="test-key",
+        SAFE_BROWSING_API_URL=api_url,
+        SAFE_BROWSING_TIMEOUT=5,
+        SAFE_BROWSING_UPDATE_INTERVAL=1800
+    )
+    db = LocalThreatDatabase(settings, threat_types=["MALWARE"])
+    await db.start()
+    try:
+        assert await db.sync() == 600
+        assert db.ready
+
+        assert await db.find_unsafe_urls(["https://example.com/"]) == set()
+        assert full_hash_requests == []
+
+        for _ in range(2):
+            assert await db.find_unsafe_urls([MALWARE_URL, "https://example.com/"]) == {MALWARE_URL}
+        # The second check is answered from the full-hash cache
+        assert len(full_hash_requests) == 1
+    finally:
+        await db.stop()
+
+
+@pytest.mark.asyncio
+async def test_expired_positive_entry_is_rechecked_despite_negative_cache():
+    db = LocalThreatDatabase(MagicMock(), threat_types=["MALWARE"])
+    full_hash = url_hashes(MALWARE_URL)[0]
+    db.prefixes = PrefixSet([full_hash[:4]])
+    db._positive_cache[full_hash] = 0.0
+    db._negative_cache[full_hash[:4]] = float("inf")
+    db._find_full_hashes = AsyncMock(return_value={full_hash})
+
+    assert await db.find_unsafe_urls([MALWARE_URL]) == {MALWARE_URL}
+    db._find_full_hashes.assert_awaited_once_with([full_hash[:4]])
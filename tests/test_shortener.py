@@ -1,7 +1,11 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from app.services.shortener import ShortenService
 from app.db.models import ShortUrl
+from app.db.repository import CREATE_MANY_CHUNK_SIZE, ShortUrlRepository
+from app.core.single_flight import SingleFlight
+from sqlalchemy.dialects import postgresql
 from datetime import datetime, timedelta, UTC
 
 @pytest.mark.asyncio
@@ -26,7 +30,8 @@ async def test_create_short_url_new(monkeypatch):
         repository=repository,
         cache_manager=MagicMock(),
         stats_queue=None,
-        settings=MagicMock()
+        settings=MagicMock(),
+        validator=AsyncMock()
     )
     result = await service.create_short_url("https://test.com")
     assert result.short_code == "abc123"
@@ -53,7 +58,8 @@ async def test_create_short_url_existing(monkeypatch):
         repository=repository,
         cache_manager=MagicMock(),
         stats_queue=None,
-        settings=MagicMock()
+        settings=MagicMock(),
+        validator=AsyncMock()
     )
     result = await service.create_short_url("https://test.com")
     assert result is existing
@@ -161,4 +167,113 @@ async def test_get_url_stats_not_found():
         settings=MagicMock()
     )
     with pytest.raises(ValueError):
-        await service.get_url_stats("notfound") 
\ No newline at end of file
+        await service.get_url_stats("notfound") 
+
+@pytest.mark.asyncio
+async def test_resolve_short_url_coalesces_concurrent_misses():
+    db_session = MagicMock()
+    repository = MagicMock()
+    cache_manager = AsyncMock()
+
+    async def slow_lookup(short_code):
+        await asyncio.sleep(0.01)
+        return ShortUrl(
+            original_url="https://test.com",
+            short_code=short_code,
+            expires_at=datetime.now(UTC) + timedelta(days=30)
+        )
+
+    repository.get_by_short_code = AsyncMock(side_effect=slow_lookup)
+    cache_manager.get_url_mapping = AsyncMock(return_value=None)
+    service = ShortenService(
+        db_session=db_session,
+        generator=AsyncMock(),
+        repository=repository,
+        cache_manager=cache_manager,
+        stats_queue=None,
+        settings=MagicMock(URL_FILL_LOCK_MS=0),
+        single_flight=SingleFlight()
+    )
+    urls = await asyncio.gather(*[service.resolve_short_url("abc123") for _ in range(20)])
+    assert urls == ["https://test.com"] * 20
+    repository.get_by_short_code.assert_awaited_once()
+    cache_manager.set_url_mapping.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_resolve_short_url_uses_lean_reader():
+    repository = MagicMock()
+    repository.get_by_short_code = AsyncMock()
+    reader = MagicMock()
+    reader.get_mapping = AsyncMock(return_value=MagicMock(
+        original_url="https://test.com",
+        expires_at=datetime.now(UTC) + timedelta(days=30)
+    ))
+    cache_manager = AsyncMock()
+    cache_manager.get_url_mapping = AsyncMock(return_value=None)
+    service = ShortenService(
+        db_session=MagicMock(),
+        generator=AsyncMock(),
+        repository=repository,
+        cache_manager=cache_manager,
+        stats_queue=None,
+        settings=MagicMock(URL_FILL_LOCK_MS=0),
+        reader=reader
+    )
+    url = await service.resolve_short_url("abc123")
+    assert url == "https://test.com"
+    reader.get_mapping.assert_awaited_once_with("abc123")
+    repository.get_by_short_code.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_create_short_urls_bulk_dedupes_and_reuses_existing():
+    repository = MagicMock()
+    existing = ShortUrl(original_url="https://a.com", short_code="aaa111", created_at=datetime.now(UTC))
+    repository.get_many_by_original_urls = AsyncMock(return_value={"https://a.com": existing})
+    repository.create_many = AsyncMock(side_effect=lambda items: [
+        MagicMock(original_url=url, short_code=code, created_at=datetime.now(UTC)) for url, code in items
+    ])
+    generator = AsyncMock()
+    generator.generate.side_effect = lambda url: f"code-{url[-5:]}"
+    validator = MagicMock()
+    validator.find_unsafe_urls = AsyncMock(return_value=set())
+    service = ShortenService(
+        db_session=MagicMock(),
+        generator=generator,
+        repository=repository,
+        cache_manager=AsyncMock(),
+        stats_queue=None,
+        settings=MagicMock(),
+        validator=validator
+    )
+    results = await service.create_short_urls_bulk(["https://a.com", "https://b.com", "https://b.com"])
+    assert {r["original_url"]: r["short_code"] for r in results} == {
+        "https://a.com": "aaa111",
+        "https://b.com": "code-b.com",
+    }
+    repository.create_many.assert_awaited_once_with([("https://b.com", "code-b.com")])
+    validator.find_unsafe_urls.assert_awaited_once_with(["https://b.com"])
+
+
+@pytest.mark.asyncio
+async def test_create_many_splits_insert_below_bind_parameter_limit():
+    db_session = MagicMock()
+    db_session.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    db_session.commit = AsyncMock()
+    items = [(f"https://test.com/{i}", f"code{i}") for i in range(CREATE_MANY_CHUNK_SIZE + 1)]
+    await ShortUrlRepository(db_session).create_many(items)
+    assert db_session.execute.await_count == 2
+    db_session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_existing_short_codes_skips_expired_and_inactive_unless_asked():
+    db_session = MagicMock()
+    db_session.execute = AsyncMock(return_value=MagicMock(scalars=MagicMock(return_value=[])))
+    repository = ShortUrlRepository(db_session)
+    await repository.existing_short_codes(["abc123"])
+    await repository.existing_short_codes(["abc123"], active_only=False)
+    active, every = [str(call.args[0].compile(dialect=postgresql.dialect())) for call in db_session.execute.await_args_list]
+    assert "expires_at >" in active and "is_active IS NOT false" in active
+    assert "expires_at" not in every and "is_active" not in every
@@ -0,0 +1,219 @@
+import json
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.core.click_backends import StreamClickBackend
+from app.core.click_codec import ClickEvent, decode_clicks
+from app.core.rollups import ClickRollups, bucket_range
+from app.core.trending import TrendingTracker, _window_buckets, day_key
+from app.core.stats_layouts import BucketedStatsLayout, bucket_expiry
+from app.core.stats_queue import StatsQueue
+
+
+def _visit(short_code: str, timestamp: str, visitor: str = None) -> str:
+    visit = {"short_code": short_code, "timestamp": timestamp}
+    if visitor:
+        visit["visitor"] = visitor
+    return json.dumps(visit)
+
+
+def test_aggregate_visits_collapses_per_code_and_day():
+    queue = StatsQueue(redis=MagicMock(), settings=MagicMock(STATS_BACKEND="list"), archive=MagicMock())
+    visits = list(enumerate([
+        _visit("abc123", "2024-01-01T10:00:00+00:00", "v1"),
+        _visit("abc123", "2024-01-01T23:59:59+00:00", "v2"),
+        _visit("abc123", "2024-01-02T00:00:00+00:00"),
+        _visit("xyz789", "2024-01-01T12:00:00+00:00"),
+        ClickEvent("xyz789", int(datetime(2024, 1, 1, 13, tzinfo=UTC).timestamp()), "v3").encode(),
+        "not json",
+    ]))
+    batch = queue._aggregate_visits(visits)
+    assert batch.counts == {("abc123", "20240101"): 2, ("abc123", "20240102"): 1, ("xyz789", "20240101"): 2}
+    assert batch.visitors == {("abc123", "20240101"): {"v1", "v2"}, ("xyz789", "20240101"): {"v3"}}
+    assert len(batch.valid) == 5
+    assert len(batch.records) == 5
+    assert batch.records[0] == (datetime(2024, 1, 1, 10, tzinfo=UTC), "abc123", "v1")
+    assert batch.failed[0][0] == 5
+
+
+@pytest.mark.asyncio
+async def test_process_visits_empty_queue():
+    redis = MagicMock()
+    redis.rpop = AsyncMock(return_value=None)
+    queue = StatsQueue(redis=redis, settings=MagicMock(STATS_BACKEND="list"))
+    assert await queue.process_visits() == 0
+
+
+@pytest.mark.asyncio
+async def test_process_visits_releases_batch_when_apply_fails():
+    redis = MagicMock()
+    redis.rpop = AsyncMock(return_value=[_visit("abc123", "2024-01-01T10:00:00+00:00")])
+    redis.rpush = AsyncMock()
+    queue = StatsQueue(redis=redis, settings=MagicMock(STATS_BACKEND="list"))
+    queue._apply_counts = AsyncMock(side_effect=ConnectionError("redis down"))
+    with pytest.raises(ConnectionError):
+        await queue.process_visits()
+    redis.rpush.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_cleanup_scans_in_chunks_and_resumes_from_saved_cursor():
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=True)
+    redis.get = AsyncMock(return_value="42")
+    redis.delete = AsyncMock()
+    redis.scan = AsyncMock(side_effect=[(7, ["url:stats:a:daily"]), (0, ["url:stats:b:daily"])])
+    redis.keys = AsyncMock()
+    settings = MagicMock(
+        STATS_BACKEND="list", STATS_LAYOUT="hash", STATS_DAY_RETENTION=7 * 86400,
+        STATS_CLEANUP_SCAN_COUNT=100, STATS_CLEANUP_PAUSE=0
+    )
+    queue = StatsQueue(redis=redis, settings=settings)
+    queue._trim_old_fields = AsyncMock(return_value=2)
+
+    assert await queue._cleanup_all_old_stats() == 4
+    assert redis.scan.await_args_list[0].args[0] == 42
+    redis.set.assert_any_await(queue.cleanup_cursor_key, 7, ex=2 * 86400)
+    redis.delete.assert_any_await(queue.cleanup_cursor_key)
+    redis.keys.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bucketed_layout_migrates_legacy_daily_hashes():
+    today = datetime.now(UTC).strftime("%Y%m%d")
+    renames, reads, writes = MagicMock(), MagicMock(), MagicMock()
+    renames.execute = AsyncMock(return_value=[True, False])
+    reads.execute = AsyncMock(return_value=[{today: "3", "20200101": "9"}])
+    writes.execute = AsyncMock()
+    redis = MagicMock()
+    redis.pipeline = MagicMock(side_effect=[_async_context(c) for c in (renames, reads, writes)])
+    queue = StatsQueue(
+        redis=redis, settings=MagicMock(STATS_BACKEND="list"), layout=BucketedStatsLayout(retention=86400)
+    )
+
+    cutoff = (datetime.now(UTC) - timedelta(days=7)).strftime("%Y%m%d")
+    keys = ["url:stats:abc123:daily", "url:stats:xyz789:daily"]
+    assert await queue._migrate_legacy_hashes(keys, cutoff) == 1
+    # Read from the renamed key; xyz789 already had a leftover temporary key and waits
+    renames.renamenx.assert_any_call("url:stats:abc123:daily", "url:stats:migrating:abc123:daily")
+    reads.hgetall.assert_called_once_with("url:stats:migrating:abc123:daily")
+    assert redis.pipeline.call_args_list[2].kwargs == {"transaction": True}
+    writes.incrby.assert_called_once_with(f"url:stats:abc123:{today}", 3)
+    writes.delete.assert_called_once_with("url:stats:migrating:abc123:daily")
+
+
+def _async_context(value):
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=value)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+def test_bucketed_layout_writes_expiring_day_buckets_and_uniques():
+    pipe = MagicMock()
+    layout = BucketedStatsLayout(retention=86400)
+    layout.record(pipe, "abc123", "20240101", 3, {"v1", "v2"})
+    pipe.incrby.assert_called_once_with("url:stats:abc123:20240101", 3)
+    expires_at = bucket_expiry("20240101", 86400)
+    assert expires_at == int(datetime(2024, 1, 3, tzinfo=UTC).timestamp())
+    pipe.expireat.assert_any_call("url:stats:abc123:20240101", expires_at)
+    assert sorted(pipe.pfadd.call_args.args[1:]) == ["v1", "v2"]
+
+
+@pytest.mark.asyncio
+async def test_process_visits_archives_records_and_survives_archive_failure():
+    redis = MagicMock()
+    redis.rpop = AsyncMock(return_value=[_visit("abc123", "2024-01-01T10:00:00+00:00", "v1")])
+    redis.rpush = AsyncMock()
+    archive = MagicMock()
+    archive.write = AsyncMock(side_effect=ConnectionError("postgres down"))
+    queue = StatsQueue(redis=redis, settings=MagicMock(STATS_BACKEND="list"), archive=archive)
+    queue._apply_counts = AsyncMock()
+
+    assert await queue.process_visits() == 1
+    records = archive.write.await_args.args[0]
+    assert [record[1:] for record in records] == [("abc123", "v1")]
+    # Counters were applied, so the batch is not handed back for a retry
+    redis.rpush.assert_not_called()
+    assert queue._archive_errors == 1
+
+
+def test_click_event_wire_format_round_trip():
+    payload = ClickEvent("abc123", 1704103200, "v1").encode()
+    assert payload == "1|1704103200|abc123|v1"
+    decoded, errors = decode_clicks([payload, ClickEvent("xyz789", 1704103200).encode(), "2|1|abc|", "1|x|abc|"])
+    assert [(i, e.short_code, e.timestamp, e.visitor_id, e.date_key) for i, e in decoded] == [
+        (0, "abc123", 1704103200, "v1", "20240101"),
+        (1, "xyz789", 1704103200, None, "20240101"),
+    ]
+    assert [i for i, _ in errors] == [2, 3]
+
+
+def test_rollups_record_minute_and_hour_buckets():
+    pipe = MagicMock()
+    rollups = ClickRollups(layout=MagicMock(), minute_retention=60, hour_retention=3600)
+    minute = int(datetime(2024, 1, 1, 10, 5, tzinfo=UTC).timestamp()) // 60
+    rollups.record(pipe, Counter({("abc123", minute): 2, ("abc123", minute + 1): 1}))
+    pipe.hincrby.assert_any_call("url:stats:abc123:m:2024010110", "05", 2)
+    pipe.hincrby.assert_any_call("url:stats:abc123:m:2024010110", "06", 1)
+    pipe.hincrby.assert_any_call("url:stats:abc123:h:20240101", "10", 3)
+    pipe.expireat.assert_any_call("url:stats:abc123:m:2024010110", int(datetime(2024, 1, 1, 11, tzinfo=UTC).timestamp()) + 60)
+
+
+def test_bucket_range_rejects_inverted_and_oversized_ranges():
+    start = datetime(2024, 1, 1, 10, 5, 30, tzinfo=UTC)
+    assert len(bucket_range(start, start + timedelta(minutes=2), "minute")) == 3
+    with pytest.raises(ValueError):
+        bucket_range(start, start - timedelta(hours=1), "hour")
+    with pytest.raises(ValueError):
+        bucket_range(start, start + timedelta(days=2), "minute")
+
+
+def test_trending_record_updates_five_minute_and_hourly_buckets():
+    pipe = MagicMock()
+    tracker = TrendingTracker(max_bucket_size=100)
+    minute = int(datetime(2024, 1, 1, 10, 7, tzinfo=UTC).timestamp()) // 60
+    tracker.record(pipe, Counter({("abc123", minute): 2, ("abc123", minute + 1): 1, ("xyz789", minute): 4}))
+    pipe.zincrby.assert_any_call("url:trending:5m:202401011005", 3, "abc123")
+    pipe.zincrby.assert_any_call("url:trending:1h:202401011000", 4, "xyz789")
+    pipe.zremrangebyrank.assert_any_call("url:trending:1h:202401011000", 0, -101)
+
+
+def test_trending_seven_day_window_uses_daily_rollups_for_closed_days():
+    current = int(datetime(2024, 1, 8, 10, 30, tzinfo=UTC).timestamp()) // 3600
+    keys, days = _window_buckets("1h", current, 168)
+    # Hourly tail of Jan 1, whole days Jan 2-7, then the hours of Jan 8 so far
+    assert [day_key(day) for day in days] == [f"url:trending:1d:2024010{d}" for d in range(2, 8)]
+    assert keys[:13] == [f"url:trending:1h:20240101{h:02d}00" for h in range(11, 24)]
+    assert keys[13:19] == [day_key(day) for day in days]
+    assert keys[19:] == [f"url:trending:1h:20240108{h:02d}00" for h in range(0, 11)]
+
+
+@pytest.mark.asyncio
+async def test_trending_top_waits_for_the_worker_holding_the_recompute_lock():
+    redis = MagicMock()
+    redis.exists = AsyncMock(side_effect=[0, 1])
+    redis.set = AsyncMock(return_value=None)
+    redis.zrevrange = AsyncMock(return_value=[("abc123", 5.0)])
+    tracker = TrendingTracker(lock_ms=10)
+    assert await tracker.top(redis, "7d", 10) == [{"short_code": "abc123", "clicks": 5}]
+    redis.pipeline.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stream_backend_reports_group_lag_and_pending_as_backlog():
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[
+        5000, [{"name": "other", "pending": 9, "lag": 9}, {"name": "workers", "pending": 3, "lag": 40}]
+    ])
+    redis = MagicMock()
+    redis.pipeline = MagicMock(return_value=_async_context(pipe))
+    backend = StreamClickBackend(
+        redis, key="url_stats:stream", max_length=100000, group="workers",
+        claim_idle_ms=60000, max_deliveries=5, dead_letter_key="url_stats:dead", consumer="c1"
+    )
+    metrics = await backend.metrics()
+    assert metrics["queue_length"] == 43
+    assert metrics["retained"] == 5000
+
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from unittest.mock import MagicMock
+from aiohttp import web
+from fastapi import HTTPException
+
+from app.services.url_validator import URLValidator
+
+MALWARE_URL = "http://malware.test/"
+
+
+class InMemoryRedis:
+    """Just enough of the Redis client for the verdict cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def execute(self):
+        return []
+
+
+@pytest_asyncio.fixture
+async def safe_browsing_stub():
+    """Local stand-in for the Safe Browsing Lookup API that flags MALWARE_URL."""
+    requests = []
+
+    async def find(request: web.Request) -> web.Response:
+        payload = await request.json()
+        urls = [entry["url"] for entry in payload["threatInfo"]["threatEntries"]]
+        requests.append(urls)
+        matches = [
+            {"threatType": "MALWARE", "threat": {"url": url}, "cacheDuration": "300s"}
+            for url in urls if url == MALWARE_URL
+        ]
+        return web.json_response({"matches": matches} if matches else {})
+
+    app = web.Application()
+    app.router.add_post("/v4/threatMatches:find", find)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/v4", requests
+    await runner.cleanup()
+
+
+def _settings(api_url: str) -> MagicMock:
+    return MagicMock(
+        GOOGLE_SAFE_BROWSING_API_KEY="test-key",
+        SAFE_BROWSING_API_URL=api_url,
+        SAFE_BROWSING_MAX_CONNECTIONS=5,
+        SAFE_BROWSING_KEEPALIVE=30,
+        SAFE_BROWSING_TIMEOUT=5,
+        SAFE_BROWSING_SAFE_TTL=300,
+        SAFE_BROWSING_BATCH_SIZE=500,
+        SAFE_BROWSING_BATCH_WAIT_MS=5,
+        SAFE_BROWSING_FAIL_OPEN=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_validate_url_rejects_flagged_url(safe_browsing_stub):
+    api_url, _ = safe_browsing_stub
+    async with URLValidator(_settings(api_url)) as validator:
+        await validator.validate_url("https://example.com/")
+        with pytest.raises(HTTPException) as exc_info:
+            await validator.validate_url(MALWARE_URL)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_repeat_checks_are_served_from_verdict_cache(safe_browsing_stub):
+    api_url, requests = safe_browsing_stub
+    async with URLValidator(_settings(api_url), redis=InMemoryRedis()) as validator:
+        for _ in range(3):
+            unsafe = await validator.find_unsafe_urls(["https://example.com/", MALWARE_URL])
+            assert unsafe == {MALWARE_URL}
+    assert len(requests) == 1
+    assert validator.metrics() == {"verdict_cache_hits": 4, "verdict_cache_misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_checks_share_one_request(safe_browsing_stub):
+    api_url, requests = safe_browsing_stub
+    urls = [f"https://example.com/{i}" for i in range(20)] + [MALWARE_URL]
+    async with URLValidator(_settings(api_url)) as validator:
+        results = await asyncio.gather(
+            *[validator.check_safe_browsing(url) for url in urls], return_exceptions=True
+        )
+    assert len(requests) == 1
+    assert sorted(requests[0]) == sorted(urls)
+    assert all(result is None for result in results[:-1])
+    assert isinstance(results[-1], HTTPException)
+
+
+@pytest_asyncio.fixture
+async def unavailable_stub():
+    async def unavailable(request: web.Request) -> web.Response:
+        return web.Response(status=503)
+
+    app = web.Application()
+    app.router.add_post("/v4/threatMatches:find", unavailable)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/v4"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_error_status_fails_open_and_caches_nothing(unavailable_stub):
+    redis = InMemoryRedis()
+    async with URLValidator(_settings(unavailable_stub), redis=redis) as validator:
+        unsafe = await asyncio.gather(
+            validator.find_unsafe_urls(["https://example.com/"]),
+            validator.check_safe_browsing("https://example.org/")
+        )
+    assert unsafe == [set(), None]
+    assert redis.data == {}
+
+
+@pytest.mark.asyncio
+async def test_error_status_fails_closed_when_configured(unavailable_stub):
+    settings = _settings(unavailable_stub)
+    settings.SAFE_BROWSING_FAIL_OPEN = False
+    redis = InMemoryRedis()
+    async with URLValidator(settings, redis=redis) as validator:
+        with pytest.raises(HTTPException) as exc_info:
+            await validator.find_unsafe_urls(["https://example.com/"])
+    assert exc_info.value.status_code == 500
+    assert redis.data == {}